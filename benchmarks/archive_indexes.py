@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2017-2019 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Benchmark the indexes used to find the pending archives.
+
+It fills a synthetic ``archivematica_archive`` table, where most of the
+archives are registered and a bulk import just created many new archives
+which are not old enough to be archived yet. Then it times the queries
+looking for the pending archives with the former single-column status
+index, and with the composite ``(status, updated)`` index (plus the partial
+index on PostgreSQL).
+
+Run it with:
+
+.. code-block:: console
+
+   $ python benchmarks/archive_indexes.py --rows 1000000
+   $ python benchmarks/archive_indexes.py --uri postgresql://localhost/bench
+
+Only SQLAlchemy is needed, the table is dropped at the end.
+"""
+
+from __future__ import absolute_import, print_function
+
+import argparse
+import random
+import timeit
+import uuid
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+
+PENDING_STATUSES = (
+    'NEW', 'QUEUED', 'WAITING', 'PROCESSING_TRANSFER', 'PROCESSING_AIP'
+)
+
+metadata = sa.MetaData()
+
+archive = sa.Table(
+    'archivematica_archive', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('created', sa.DateTime, nullable=False),
+    sa.Column('updated', sa.DateTime, nullable=False),
+    sa.Column('sip_id', sa.String(36), nullable=False),
+    sa.Column('status', sa.String(20), nullable=False),
+    sa.Column('accession_id', sa.String(255)),
+    sa.Column('archivematica_id', sa.String(36)),
+)
+
+new_archives = sa.select([archive.c.id, archive.c.sip_id]).where(
+    (archive.c.status == 'NEW') &
+    (archive.c.updated <= sa.bindparam('before'))
+).order_by(archive.c.updated, archive.c.id).limit(500)
+"""Query used to claim the new archives."""
+
+inflight_archives = sa.select([sa.func.count()]).where(
+    archive.c.status.in_(['WAITING', 'PROCESSING_TRANSFER',
+                          'PROCESSING_AIP'])
+)
+"""Query used to look for the archives processed by Archivematica."""
+
+
+def fill(engine, rows, pending_ratio, imported):
+    """Fill the table with mostly registered archives."""
+    now = datetime.utcnow()
+    batch = []
+    with engine.begin() as conn:
+        for i in range(rows + imported):
+            if i >= rows:
+                # the archives of the bulk import
+                date = now - timedelta(seconds=random.randint(0, 600))
+                status = 'NEW'
+            else:
+                date = now - timedelta(
+                    minutes=random.randint(20, 365 * 24 * 60))
+                if random.random() < pending_ratio:
+                    status = random.choice(PENDING_STATUSES)
+                else:
+                    status = random.choice(('REGISTERED', 'REGISTERED',
+                                            'REGISTERED', 'IGNORED'))
+            batch.append({'created': date, 'updated': date,
+                          'sip_id': str(uuid.uuid4()), 'status': status})
+            if len(batch) == 10000:
+                conn.execute(archive.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(archive.insert(), batch)
+
+
+def analyze(engine):
+    """Update the statistics used by the query planner."""
+    if engine.dialect.name in ('postgresql', 'sqlite'):
+        with engine.begin() as conn:
+            conn.execute('ANALYZE')
+
+
+def run_queries(engine, repeat):
+    """Return the best time of each query, in milliseconds."""
+    before = datetime.utcnow() - timedelta(minutes=15)
+    times = {}
+    with engine.connect() as conn:
+        for name, query, params in (('new', new_archives, {'before': before}),
+                                    ('in-flight', inflight_archives, {})):
+            timer = timeit.Timer(
+                lambda: conn.execute(query, params).fetchall())
+            times[name] = min(timer.repeat(repeat, 1)) * 1000
+    return times
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--uri', default='sqlite:///archive_indexes.db')
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--pending-ratio', type=float, default=0.01)
+    parser.add_argument('--imported', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    engine = sa.create_engine(args.uri)
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    try:
+        fill(engine, args.rows, args.pending_ratio, args.imported)
+        status_index = sa.Index('idx_ark_status', archive.c.status)
+        status_index.create(engine)
+        analyze(engine)
+        before = run_queries(engine, args.repeat)
+
+        status_index.drop(engine)
+        sa.Index('idx_ark_status_updated',
+                 archive.c.status, archive.c.updated).create(engine)
+        if engine.dialect.name == 'postgresql':
+            sa.Index('idx_ark_pending', archive.c.status, archive.c.updated,
+                     postgresql_where=archive.c.status.in_(PENDING_STATUSES)
+                     ).create(engine)
+        analyze(engine)
+        after = run_queries(engine, args.repeat)
+    finally:
+        metadata.drop_all(engine)
+
+    print('{0} rows, {1:.0%} pending, {2} just imported, on {3}'.format(
+        args.rows, args.pending_ratio, args.imported, engine.dialect.name))
+    print('{0:<12}{1:>12}{2:>12}'.format('query', 'before', 'after'))
+    for name in sorted(before):
+        print('{0:<12}{1:>10.2f}ms{2:>10.2f}ms'.format(
+            name, before[name], after[name]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2017-2019 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Local cache of the AIPs downloaded from Archivematica.
+
+The cache is enabled by setting
+:py:data:`invenio_archivematica.config.ARCHIVEMATICA_AIP_CACHE_DIR`.
+"""
+
+import errno
+import os
+import tempfile
+
+
+class AIPCache(object):
+    """Directory keeping the last downloaded AIPs.
+
+    The AIPs are stored as one file per Archivematica ID. A file is only
+    visible once it is complete: it is written in a temporary file which is
+    renamed once its size has been verified. The least recently used AIPs
+    are removed when the total size exceeds the budget.
+    """
+
+    tmp_prefix = '.tmp-'
+    """Prefix of the files being written."""
+
+    def __init__(self, directory, max_size):
+        """Initialize the cache.
+
+        :param str directory: the directory of the cache, created if needed
+        :param int max_size: the maximum size of the cache, in bytes
+        """
+        self.directory = directory
+        self.max_size = max_size
+
+    def path(self, uuid):
+        """Return the path of an AIP in the cache."""
+        return os.path.join(self.directory, str(uuid))
+
+    def get(self, uuid):
+        """Return the path of a cached AIP, or None.
+
+        The AIP is marked as recently used.
+
+        :param str uuid: the ID of the AIP in Archivematica
+        """
+        path = self.path(uuid)
+        try:
+            os.utime(path, None)
+        except OSError:
+            return None
+        return path
+
+    def tee(self, uuid, chunks, size=None):
+        """Yield the chunks of an AIP while storing them in the cache.
+
+        The AIP is only stored if all the chunks are consumed and their
+        total size is the expected one.
+
+        :param str uuid: the ID of the AIP in Archivematica
+        :param chunks: the iterator over the content of the AIP
+        :param int size: the expected size of the AIP, in bytes
+        """
+        if size is not None and size > self.max_size:
+            for chunk in chunks:
+                yield chunk
+            return
+        try:
+            os.makedirs(self.directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=self.tmp_prefix)
+        written = 0
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    written += len(chunk)
+                    yield chunk
+            if size is not None and written != size:
+                return
+            os.rename(tmp, self.path(uuid))
+            tmp = None
+        finally:
+            # incomplete download, or wrong size
+            if tmp is not None:
+                os.remove(tmp)
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used AIPs until the cache fits."""
+        files = []
+        for name in os.listdir(self.directory):
+            if name.startswith(self.tmp_prefix):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:  # removed in the meantime
+                continue
+            files.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in files)
+        for _, size, name in sorted(files):
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total -= size
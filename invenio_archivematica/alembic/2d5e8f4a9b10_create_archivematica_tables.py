@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2017-2019 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Create archivematica tables."""
+
+import sqlalchemy as sa
+import sqlalchemy_utils
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '2d5e8f4a9b10'
+down_revision = '6b0b7a1d2c3e'
+branch_labels = ()
+depends_on = 'ad6ee57b71f9'  # invenio-sipstore
+
+
+def upgrade():
+    """Upgrade database."""
+    op.create_table(
+        'archivematica_archive',
+        sa.Column('created', sa.DateTime(), nullable=False),
+        sa.Column('updated', sa.DateTime(), nullable=False),
+        sa.Column(
+            'id',
+            sa.BigInteger().with_variant(sa.Integer(), 'sqlite'),
+            nullable=False),
+        sa.Column(
+            'sip_id', sqlalchemy_utils.types.uuid.UUIDType(),
+            nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('accession_id', sa.String(length=255), nullable=True),
+        sa.Column(
+            'archivematica_id', sqlalchemy_utils.types.uuid.UUIDType(),
+            nullable=True),
+        sa.ForeignKeyConstraint(
+            ['sip_id'], [u'sipstore_sip.id'],
+            name='fk_archivematica_sip_id'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('accession_id')
+    )
+    op.create_index(
+        'idx_ark_accession_id', 'archivematica_archive', ['accession_id'],
+        unique=False)
+    op.create_index(
+        'idx_ark_sip', 'archivematica_archive', ['sip_id'], unique=False)
+    op.create_index(
+        'idx_ark_status', 'archivematica_archive', ['status'], unique=False)
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_index('idx_ark_status', table_name='archivematica_archive')
+    op.drop_index('idx_ark_sip', table_name='archivematica_archive')
+    op.drop_index(
+        'idx_ark_accession_id', table_name='archivematica_archive')
+    op.drop_table('archivematica_archive')
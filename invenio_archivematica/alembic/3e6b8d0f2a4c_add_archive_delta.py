@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2017-2019 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Add the delta of the archives."""
+
+import sqlalchemy as sa
+import sqlalchemy_utils
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '3e6b8d0f2a4c'
+down_revision = '7f3a9c1e5b2d'
+branch_labels = ()
+depends_on = None
+
+
+def upgrade():
+    """Upgrade database."""
+    op.add_column(
+        'archivematica_archive',
+        sa.Column('delta', sqlalchemy_utils.types.json.JSONType(),
+                  nullable=True))
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_column('archivematica_archive', 'delta')
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2017-2019 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Add the fixity checks of the archives."""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '4b8d2f6a1c3e'
+down_revision = 'e1a3c5b7d9f2'
+branch_labels = ()
+depends_on = None
+
+
+def upgrade():
+    """Upgrade database."""
+    op.add_column(
+        'archivematica_archive',
+        sa.Column('fixity_checked_at', sa.DateTime(), nullable=True))
+    op.add_column(
+        'archivematica_archive',
+        sa.Column('fixity_ok', sa.Boolean(name='ck_ark_fixity_ok'),
+                  nullable=True))
+    op.create_index('idx_ark_status_fixity', 'archivematica_archive',
+                    ['status', 'fixity_checked_at'])
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_index('idx_ark_status_fixity',
+                  table_name='archivematica_archive')
+    op.drop_column('archivematica_archive', 'fixity_ok')
+    op.drop_column('archivematica_archive', 'fixity_checked_at')
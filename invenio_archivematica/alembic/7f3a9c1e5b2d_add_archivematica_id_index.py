@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2017-2019 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Add an index on the ID of the archives in Archivematica."""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '7f3a9c1e5b2d'
+down_revision = '4b8d2f6a1c3e'
+branch_labels = ()
+depends_on = None
+
+
+def upgrade():
+    """Upgrade database."""
+    op.create_index('idx_ark_archivematica_id', 'archivematica_archive',
+                    ['archivematica_id'], unique=False)
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_index('idx_ark_archivematica_id',
+                  table_name='archivematica_archive')
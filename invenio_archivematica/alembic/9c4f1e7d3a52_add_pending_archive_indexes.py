@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2017-2019 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Add indexes to find the pending archives."""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '9c4f1e7d3a52'
+down_revision = '2d5e8f4a9b10'
+branch_labels = ()
+depends_on = None
+
+PENDING_STATUSES = (
+    'NEW', 'QUEUED', 'WAITING', 'PROCESSING_TRANSFER', 'PROCESSING_AIP'
+)
+
+
+def upgrade():
+    """Upgrade database."""
+    op.create_index(
+        'idx_ark_status_updated', 'archivematica_archive',
+        ['status', 'updated'], unique=False)
+    # the new index starts with the status, so this one is useless
+    op.drop_index('idx_ark_status', table_name='archivematica_archive')
+    # only the archives with a pending status, where it is supported
+    condition = sa.text('status IN ({})'.format(
+        ', '.join("'{}'".format(s) for s in PENDING_STATUSES)))
+    op.create_index(
+        'idx_ark_pending', 'archivematica_archive',
+        ['status', 'updated'], unique=False,
+        postgresql_where=condition, sqlite_where=condition)
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_index('idx_ark_pending', table_name='archivematica_archive')
+    op.create_index(
+        'idx_ark_status', 'archivematica_archive', ['status'], unique=False)
+    op.drop_index(
+        'idx_ark_status_updated', table_name='archivematica_archive')
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2017-2019 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Add the status checks of the archives."""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'e1a3c5b7d9f2'
+down_revision = '9c4f1e7d3a52'
+branch_labels = ()
+depends_on = None
+
+
+def upgrade():
+    """Upgrade database."""
+    op.add_column(
+        'archivematica_archive',
+        sa.Column('next_check_at', sa.DateTime(), nullable=True))
+    op.add_column(
+        'archivematica_archive',
+        sa.Column('check_attempts', sa.Integer(), nullable=False,
+                  server_default='0'))
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_column('archivematica_archive', 'check_attempts')
+    op.drop_column('archivematica_archive', 'next_check_at')
@@ -8,10 +8,14 @@
 
 """API for Invenio 3 module to connect Invenio to Archivematica."""
 
-from invenio_archivematica.models import ArchiveStatus
-from invenio_archivematica.tasks import oais_fail_transfer, \
-    oais_finish_transfer, oais_process_aip, oais_process_transfer, \
-    oais_start_transfer
+from datetime import datetime
+
+from invenio_db import db
+
+from invenio_archivematica.models import Archive, ArchiveStatus
+from invenio_archivematica.tasks import oais_change_status_bulk, \
+    oais_fail_transfer, oais_finish_transfer, oais_process_aip, \
+    oais_process_transfer, oais_start_transfer
 
 
 def start_transfer(sip, accession_id, archivematica_id=None):
@@ -88,6 +92,7 @@ def fail_transfer(sip, accession_id='', archivematica_id=None):
 
 change_status_func = {
     ArchiveStatus.NEW: start_transfer,
+    ArchiveStatus.QUEUED: start_transfer,
     ArchiveStatus.WAITING: start_transfer,
     ArchiveStatus.PROCESSING_TRANSFER: process_transfer,
     ArchiveStatus.PROCESSING_AIP: process_aip,
@@ -97,3 +102,142 @@ change_status_func = {
     ArchiveStatus.DELETED: None
 }
 """Dictionary that maps status to functions used to change the status."""
+
+
+def change_status_bulk(status, sip_ids=None, accession_ids=None,
+                       archivematica_ids=None):
+    """Change the status of many sips at once.
+
+    The sips are given either by their ID, or by the accession ID of their
+    archive. All the archives are changed with a single statement and a
+    single commit, and the signals are sent for each sip having an archive.
+    See
+    :py:func:`invenio_archivematica.tasks.oais_change_status_bulk`.
+
+    :param status: the new status
+    :type status: :py:class:`invenio_archivematica.models.ArchiveStatus`
+    :param list sip_ids: the ID of the sips
+    :param list accession_ids: the accession ID of the archives
+    :param dict archivematica_ids: the new ID in Archivematica of the
+        archives, by ID of their sip or by accession ID
+    :raises ValueError: if both sip IDs and accession IDs are given
+    """
+    if sip_ids is not None and accession_ids is not None:
+        raise ValueError('Give either sip IDs or accession IDs, not both.')
+    archivematica_ids = archivematica_ids or {}
+    if accession_ids is not None:
+        sips = dict(db.session.query(
+            Archive.accession_id, Archive.sip_id
+        ).filter(Archive.accession_id.in_(list(accession_ids))))
+        sip_ids = sips.values()
+        archivematica_ids = dict((sips[accession_id], archivematica_id)
+                                 for accession_id, archivematica_id
+                                 in archivematica_ids.items()
+                                 if accession_id in sips)
+    oais_change_status_bulk(
+        [str(sip_id) for sip_id in sip_ids or []], str(status),
+        dict((str(sip_id), archivematica_id and str(archivematica_id))
+             for sip_id, archivematica_id in archivematica_ids.items()))
+
+
+def process_transfers(sip_ids=None, accession_ids=None,
+                      archivematica_ids=None):
+    """Mark the transfer of many sips in progress.
+
+    See :py:func:`invenio_archivematica.api.change_status_bulk`.
+    """
+    change_status_bulk(ArchiveStatus.PROCESSING_TRANSFER, sip_ids,
+                       accession_ids, archivematica_ids)
+
+
+def process_aips(sip_ids=None, accession_ids=None, archivematica_ids=None):
+    """Mark the aip of many sips in progress.
+
+    See :py:func:`invenio_archivematica.api.change_status_bulk`.
+    """
+    change_status_bulk(ArchiveStatus.PROCESSING_AIP, sip_ids,
+                       accession_ids, archivematica_ids)
+
+
+def finish_transfers(sip_ids=None, accession_ids=None,
+                     archivematica_ids=None):
+    """Finish the archive process of many sips.
+
+    See :py:func:`invenio_archivematica.api.change_status_bulk`.
+    """
+    change_status_bulk(ArchiveStatus.REGISTERED, sip_ids,
+                       accession_ids, archivematica_ids)
+
+
+def fail_transfers(sip_ids=None, accession_ids=None, archivematica_ids=None):
+    """Fail the archive process of many sips.
+
+    See :py:func:`invenio_archivematica.api.change_status_bulk`.
+    """
+    change_status_bulk(ArchiveStatus.FAILED, sip_ids,
+                       accession_ids, archivematica_ids)
+
+
+change_status_bulk_func = {
+    ArchiveStatus.PROCESSING_TRANSFER: process_transfers,
+    ArchiveStatus.PROCESSING_AIP: process_aips,
+    ArchiveStatus.REGISTERED: finish_transfers,
+    ArchiveStatus.FAILED: fail_transfers,
+}
+"""Dictionary that maps status to functions used to change many status."""
+
+
+def change_status_async(archive, status, archivematica_id=None):
+    """Accept a new status for an archive, and do the change in background.
+
+    The new status is saved at once with a conditional UPDATE, so that
+    repeating the same change is a no-op, even if it is done concurrently.
+    The rest of the change is enqueued after the commit, so that a task
+    never runs before the status it relies on is saved:
+
+    - for PROCESSING_TRANSFER, PROCESSING_AIP, REGISTERED and FAILED, the
+      sip and the signals are handled by
+      :py:func:`invenio_archivematica.tasks.oais_notify_status`;
+    - for NEW and WAITING, the archive is QUEUED and its transfer is
+      started by :py:func:`invenio_archivematica.tasks.oais_start_transfer`.
+      If the transfer can't be enqueued, the archive stays QUEUED until
+      :py:meth:`invenio_archivematica.models.Archive.release_queued`
+      makes it NEW again;
+    - IGNORED and DELETED have nothing else to do.
+
+    :param archive: the archive
+    :type archive: :py:class:`invenio_archivematica.models.Archive`
+    :param status: the new status
+    :type status: :py:class:`invenio_archivematica.models.ArchiveStatus`
+    :param str archivematica_id: the new ID in Archivematica, if it changes
+    :returns: False if the archive has already this status, and nothing
+        was done
+    :rtype: bool
+    """
+    sip_id = str(archive.sip_id)
+    current_id = archive.archivematica_id and str(archive.archivematica_id)
+    archivematica_id = archivematica_id and str(archivematica_id)
+    if status in change_status_bulk_func:
+        return bool(oais_change_status_bulk(
+            [sip_id], str(status),
+            {sip_id: archivematica_id} if archivematica_id else None,
+            notify_async=True, only_changed=True))
+    if change_status_func[status] is start_transfer:
+        sip, accession_id = archive.sip, archive.accession_id
+        # the transfer is already enqueued or started
+        changed = Archive.query.filter(
+            Archive.sip_id == sip_id,
+            Archive.status.notin_([ArchiveStatus.QUEUED, status])
+        ).update({'status': ArchiveStatus.QUEUED,
+                  'updated': datetime.utcnow()},
+                 synchronize_session=False)
+        db.session.commit()
+        if changed:
+            start_transfer(sip, accession_id, archivematica_id or current_id)
+        return bool(changed)
+    changed = Archive.set_status(
+        [sip_id], status,
+        {sip_id: archivematica_id} if archivematica_id else None,
+        only_changed=True)
+    db.session.commit()
+    return bool(changed)
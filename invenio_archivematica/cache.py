@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2017-2019 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Short-lived caches of the status of the archives in Archivematica.
+
+The cache used by the extension is configured with
+:py:data:`invenio_archivematica.config.ARCHIVEMATICA_STATUS_CACHE`.
+"""
+
+import threading
+import time
+from abc import ABCMeta, abstractmethod
+from collections import OrderedDict
+
+import six
+
+
+class _Call(object):
+    """A request to Archivematica shared by several threads."""
+
+    def __init__(self):
+        """Initialize the call."""
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+@six.add_metaclass(ABCMeta)
+class StatusCache(object):
+    """Base class of the caches of the status of the archives.
+
+    The subclasses store the values, this class makes sure that only one
+    request to Archivematica is sent at once for a given archive: the
+    other threads asking for it wait for its answer.
+    """
+
+    def __init__(self, ttl, max_size=None):
+        """Initialize the cache.
+
+        :param int ttl: the number of seconds a status is kept
+        :param int max_size: the maximum number of statuses kept, if the
+            backend supports it
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    @abstractmethod
+    def get(self, key):
+        """Return the cached value of a key, or None."""
+
+    @abstractmethod
+    def set(self, key, value):
+        """Cache the value of a key."""
+
+    def get_or_fetch(self, key, fetch):
+        """Return the cached value of a key, or fetch it.
+
+        :param str key: the key, e.g. the ID of the archive in Archivematica
+            and its status in Invenio
+        :param fetch: the function returning the value of the key. Its
+            exceptions are raised in all the waiting threads, and nothing
+            is cached.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            # the previous leader may have finished in the meantime
+            value = self.get(key)
+            if value is None:
+                value = fetch()
+                self.set(key, value)
+            call.value = value
+            return value
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+
+class MemoryStatusCache(StatusCache):
+    """Cache of the process, with a LRU eviction."""
+
+    def __init__(self, ttl, max_size=None):
+        """Initialize the cache."""
+        super(MemoryStatusCache, self).__init__(ttl, max_size)
+        self._values = OrderedDict()
+
+    def get(self, key):
+        """Return the cached value of a key, or None."""
+        with self._lock:
+            item = self._values.pop(key, None)
+            if item is None or item[0] <= time.time():
+                return None
+            # move it to the end of the LRU
+            self._values[key] = item
+            return item[1]
+
+    def set(self, key, value):
+        """Cache the value of a key."""
+        with self._lock:
+            self._values.pop(key, None)
+            self._values[key] = (time.time() + self.ttl, value)
+            while self.max_size and len(self._values) > self.max_size:
+                self._values.popitem(last=False)
+
+
+class InvenioCacheStatusCache(StatusCache):
+    """Cache shared by all the processes, using Invenio-Cache.
+
+    It needs the ``cache`` extra: ``pip install invenio-archivematica[cache]``.
+    """
+
+    prefix = 'invenio-archivematica:status:'
+    """Prefix of the keys in the cache."""
+
+    def get(self, key):
+        """Return the cached value of a key, or None."""
+        from invenio_cache import current_cache
+        return current_cache.get(self.prefix + key)
+
+    def set(self, key, value):
+        """Cache the value of a key."""
+        from invenio_cache import current_cache
+        current_cache.set(self.prefix + key, value, timeout=self.ttl)
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2017-2019 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Client of the Archivematica Dashboard and Storage APIs."""
+
+import os
+import threading
+from xml.etree import ElementTree
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.compat import urlencode
+from urllib3.util.retry import Retry
+
+from invenio_archivematica.models import ArchiveStatus, status_converter
+
+
+class ArchivematicaClient(object):
+    """Client of the Archivematica Dashboard and Storage APIs.
+
+    All the requests of a process go through the same
+    :py:class:`requests.Session`, so the connections to Archivematica are
+    kept alive and reused. The session is created again after a fork.
+
+    The client is created by the extension, use it with
+    :py:data:`invenio_archivematica.proxies.current_archivematica`:
+
+    .. code-block:: python
+
+        from invenio_archivematica.proxies import current_archivematica
+        current_archivematica.client.get_ingest_status(uuid)
+    """
+
+    def __init__(self, dashboard_url, dashboard_user, dashboard_api_key,
+                 storage_url, storage_user, storage_api_key, pool_size=10,
+                 timeout=None, retries=0):
+        """Initialize the client.
+
+        :param str dashboard_url: the URL of Archivematica Dashboard
+        :param str dashboard_user: the user of Archivematica Dashboard
+        :param str dashboard_api_key: the API key of the user
+        :param str storage_url: the URL of Archivematica Storage
+        :param str storage_user: the user of Archivematica Storage
+        :param str storage_api_key: the API key of the user
+        :param int pool_size: the number of connections kept alive by host
+        :param timeout: the connect and read timeouts of the requests, in
+            seconds. See :py:mod:`requests`.
+        :param int retries: the number of retries of a failed request
+        """
+        self.dashboard_url = dashboard_url
+        self.dashboard_params = {
+            'username': dashboard_user,
+            'api_key': dashboard_api_key
+        }
+        self.storage_url = storage_url
+        self.storage_params = {
+            'username': storage_user,
+            'api_key': storage_api_key
+        }
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.retries = retries
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        """Create the client from the configuration of the application.
+
+        :param dict config: the configuration
+        """
+        return cls(
+            dashboard_url=config['ARCHIVEMATICA_DASHBOARD_URL'],
+            dashboard_user=config['ARCHIVEMATICA_DASHBOARD_USER'],
+            dashboard_api_key=config['ARCHIVEMATICA_DASHBOARD_API_KEY'],
+            storage_url=config['ARCHIVEMATICA_STORAGE_URL'],
+            storage_user=config['ARCHIVEMATICA_STORAGE_USER'],
+            storage_api_key=config['ARCHIVEMATICA_STORAGE_API_KEY'],
+            pool_size=config['ARCHIVEMATICA_HTTP_POOL_SIZE'],
+            timeout=(config['ARCHIVEMATICA_HTTP_CONNECT_TIMEOUT'],
+                     config['ARCHIVEMATICA_HTTP_READ_TIMEOUT']),
+            retries=config['ARCHIVEMATICA_HTTP_RETRIES'],
+        )
+
+    @property
+    def session(self):
+        """The HTTP session of the current process."""
+        with self._lock:
+            if self._session is None or self._pid != os.getpid():
+                retry = Retry(total=self.retries, backoff_factor=0.5,
+                              status_forcelist=(502, 503, 504),
+                              raise_on_status=False)
+                adapter = HTTPAdapter(pool_connections=self.pool_size,
+                                      pool_maxsize=self.pool_size,
+                                      max_retries=retry)
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._session = session
+                self._pid = os.getpid()
+            return self._session
+
+    def dashboard_get(self, path, **kwargs):
+        """Send a GET request to Archivematica Dashboard.
+
+        :param str path: the path of the endpoint, such as
+            ``/api/transfer/status/<uuid>/``
+        :param kwargs: the other arguments of :py:func:`requests.get`
+        :rtype: :py:class:`requests.Response`
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.get(self.dashboard_url + path,
+                                params=self.dashboard_params, **kwargs)
+
+    def storage_get(self, path, **kwargs):
+        """Send a GET request to Archivematica Storage.
+
+        :param str path: the path of the endpoint, such as
+            ``/api/v2/file/<uuid>/``
+        :param kwargs: the other arguments of :py:func:`requests.get`
+        :rtype: :py:class:`requests.Response`
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.get(self.storage_url + path,
+                                params=self.storage_params, **kwargs)
+
+    def get_transfer_status(self, uuid):
+        """Return the status of a transfer in Archivematica.
+
+        :param str uuid: the ID of the transfer in Archivematica
+        :raises requests.HTTPError: if Archivematica answers with an error
+        :rtype: dict
+        """
+        response = self.dashboard_get(
+            '/api/transfer/status/{}/'.format(uuid))
+        response.raise_for_status()
+        return response.json()
+
+    def get_ingest_status(self, uuid):
+        """Return the status of an ingest in Archivematica.
+
+        :param str uuid: the ID of the sip in Archivematica
+        :raises requests.HTTPError: if Archivematica answers with an error
+        :rtype: dict
+        """
+        response = self.dashboard_get('/api/ingest/status/{}/'.format(uuid))
+        response.raise_for_status()
+        return response.json()
+
+    def get_real_status(self, status, archivematica_id):
+        """Ask Archivematica the current status of an archive.
+
+        While the archive is a transfer, the transfer status is asked. Once
+        the transfer is complete, Archivematica gives the ID of the created
+        sip, and its ingest status is asked.
+
+        :param status: the status of the archive in Invenio
+        :type status: :py:class:`invenio_archivematica.models.ArchiveStatus`
+        :param str archivematica_id: the ID of the archive in Archivematica
+        :raises requests.HTTPError: if Archivematica answers with an error
+        :returns: the status of the archive in Archivematica and its ID
+        :rtype: tuple
+        """
+        archivematica_id = str(archivematica_id)
+        if status in (ArchiveStatus.WAITING,
+                      ArchiveStatus.PROCESSING_TRANSFER):
+            transfer = self.get_transfer_status(archivematica_id)
+            status = status_converter(transfer['status'])
+            # if the transfer is not complete, we stop here
+            if status != ArchiveStatus.REGISTERED:
+                return status, archivematica_id
+            archivematica_id = transfer['sip_uuid']
+        ingest = self.get_ingest_status(archivematica_id)
+        return status_converter(ingest['status'], aip_processing=True), \
+            archivematica_id
+
+    def get_file(self, uuid):
+        """Return the description of a file in Archivematica Storage.
+
+        :param str uuid: the ID of the file (e.g. an AIP) in Archivematica
+        :raises requests.HTTPError: if Archivematica answers with an error
+        :rtype: dict
+        """
+        response = self.storage_get('/api/v2/file/{}/'.format(uuid))
+        response.raise_for_status()
+        return response.json()
+
+    def get_checksum(self, uuid):
+        """Return the checksum of a package recorded by Archivematica.
+
+        The checksum is read from the PREMIS fixity of the pointer file of
+        the package. Archivematica Storage only keeps a pointer file for the
+        compressed AIPs.
+
+        :param str uuid: the ID of the package (e.g. an AIP) in Archivematica
+        :raises requests.HTTPError: if Archivematica answers with an error
+        :returns: the name of the algorithm (or None if not given) and the
+            checksum, or None if the package has no recorded checksum
+        :rtype: tuple
+        """
+        response = self.storage_get(
+            '/api/v2/file/{}/pointer_file/'.format(uuid))
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        root = ElementTree.fromstring(response.content)
+        for element in root.iter():
+            if _local_name(element.tag) != 'fixity':
+                continue
+            values = dict((_local_name(child.tag), (child.text or '').strip())
+                          for child in element)
+            if values.get('messageDigest'):
+                # e.g. "SHA-256" for hashlib's "sha256"
+                algorithm = values.get('messageDigestAlgorithm', '')
+                return algorithm.lower().replace('-', '') or None, \
+                    values['messageDigest']
+        return None
+
+    def check_fixity(self, uuid, timeout=None):
+        """Ask Archivematica Storage to check the fixity of a package.
+
+        Archivematica reads the whole package to check it, so this request
+        can take long.
+
+        :param str uuid: the ID of the package (e.g. an AIP) in Archivematica
+        :param timeout: the timeouts of the request, instead of the default
+            ones
+        :raises requests.HTTPError: if Archivematica answers with an error
+        :returns: the report of the check, with its ``success``
+        :rtype: dict
+        """
+        response = self.storage_get(
+            '/api/v2/file/{}/check_fixity/'.format(uuid),
+            timeout=timeout or self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def download_path(self, uuid):
+        """Return the path and the query string to download a file.
+
+        The path is relative to the URL of Archivematica Storage.
+
+        :param str uuid: the ID of the file (e.g. an AIP) in Archivematica
+        :rtype: str
+        """
+        return '/api/v2/file/{}/download/?{}'.format(
+            uuid, urlencode(sorted(self.storage_params.items())))
+
+    def download(self, uuid, **kwargs):
+        """Start the download of an AIP from Archivematica Storage.
+
+        The content of the response is not read yet, use
+        :py:meth:`requests.Response.iter_content` to stream it.
+
+        :param str uuid: the ID of the AIP in Archivematica
+        :param kwargs: the other arguments of :py:func:`requests.get`
+        :rtype: :py:class:`requests.Response`
+        """
+        return self.storage_get('/api/v2/file/{}/download/'.format(uuid),
+                                stream=True, **kwargs)
+
+
+def _local_name(tag):
+    """Return the name of an XML tag without its namespace."""
+    return tag.rsplit('}', 1)[-1]
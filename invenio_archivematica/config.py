@@ -26,6 +26,91 @@ ARCHIVEMATICA_ISARCHIVABLE_FACTORY = 'invenio_archivematica.' \
 See :py:func:`invenio_archivematica.factories.is_archivable_default`.
 """
 
+ARCHIVEMATICA_SCAN_CHUNK_SIZE = 500
+"""Number of archives read or claimed at once by the periodic tasks.
+
+See :py:func:`invenio_archivematica.tasks.archive_new_sips` and
+:py:func:`invenio_archivematica.tasks.oais_reconcile_archives`.
+"""
+
+ARCHIVEMATICA_DISPATCH_BATCH_SIZE = 50
+"""Number of transfers started by a single Celery message.
+
+When the new sips are archived with a delay, the transfers are sent to
+Celery by chunks of this size instead of one message per sip. Set it to 1 to
+send one message per sip.
+"""
+
+ARCHIVEMATICA_MAX_SIPS_PER_RUN = None
+"""Maximum number of sips sent to archive by one run of the task.
+
+The remaining sips are archived by the next runs. ``None`` means no limit.
+See :py:func:`invenio_archivematica.tasks.archive_new_sips`.
+"""
+
+ARCHIVEMATICA_QUEUED_TIMEOUT = 24 * 60 * 60
+"""Time in seconds after which a queued transfer is considered lost.
+
+The archives still QUEUED after this time get the NEW status back, to be
+claimed again by :py:func:`invenio_archivematica.tasks.archive_new_sips`.
+It must be longer than the time a transfer can wait in Celery and run.
+``None`` never releases them.
+"""
+
+ARCHIVEMATICA_RECONCILE_WORKERS = 8
+"""Number of concurrent requests to Archivematica to update the status.
+
+See :py:func:`invenio_archivematica.tasks.oais_reconcile_archives`.
+"""
+
+ARCHIVEMATICA_STATUS_BATCH_SIZE = 500
+"""Maximum number of archives asked at once to ``/oais/archives/status``."""
+
+ARCHIVEMATICA_STATUS_BATCH_WORKERS = 8
+"""Number of concurrent requests to Archivematica for a batch of archives."""
+
+ARCHIVEMATICA_LIST_SIZE = 100
+"""Default number of archives in a page of ``/oais/archives/``."""
+
+ARCHIVEMATICA_LIST_MAX_SIZE = 1000
+"""Maximum number of archives in a page of ``/oais/archives/``."""
+
+ARCHIVEMATICA_POLL_BASE_DELAY = 60
+"""Delay in seconds before checking the status of an archive that changed.
+
+Each check that does not change the status doubles the delay. See
+:py:func:`invenio_archivematica.tasks.oais_reconcile_archives`.
+"""
+
+ARCHIVEMATICA_POLL_MAX_DELAY = 60 * 60
+"""Maximum delay in seconds between two checks of an archive status."""
+
+ARCHIVEMATICA_FIXITY_INTERVAL = 90 * 24 * 60 * 60
+"""Number of seconds between two fixity checks of an AIP.
+
+See :py:func:`invenio_archivematica.tasks.oais_audit_fixity`.
+"""
+
+ARCHIVEMATICA_FIXITY_RETRY_DELAY = 24 * 60 * 60
+"""Number of seconds before checking again an AIP whose check gave no verdict.
+
+E.g. Archivematica Storage was not available or timed out. See
+:py:func:`invenio_archivematica.tasks.oais_audit_fixity`.
+"""
+
+ARCHIVEMATICA_FIXITY_WORKERS = 2
+"""Number of fixity checks done by Archivematica at the same time."""
+
+ARCHIVEMATICA_FIXITY_MAX_PER_RUN = 1000
+"""Maximum number of fixity checks of a run of the periodic task.
+
+The next run continues with the archives which have not been checked. The
+checks which give no verdict are not counted.
+"""
+
+ARCHIVEMATICA_FIXITY_TIMEOUT = 60 * 60
+"""Timeout in seconds to wait for the result of a fixity check."""
+
 ARCHIVEMATICA_ORGANIZATION_NAME = 'CERN'
 """Organization name setup in Archivematica's dashboard."""
 
@@ -36,6 +121,59 @@ If you use a custom factory to do the transfer, you can put whatever you want
 here, it will be passed to your factory. See
 :py:func:`invenio_archivematica.factories.transfer_cp` and
 :py:data:`invenio_archivematica.config.ARCHIVEMATICA_TRANSFER_FACTORY`.
+
+The transfers are not started through the API of Archivematica, but by its
+watched directories, so the folder also sets the type of the transfer. With
+:py:func:`invenio_archivematica.factories.transfer_tar`, the destination
+must be the watched directory of the zipped transfers (e.g.
+``zippedDirectory``), or Archivematica processes the tar file as a standard
+transfer of a single file.
+"""
+
+ARCHIVEMATICA_TRANSFER_WORKERS = 1
+"""Number of files copied at once by
+:py:func:`invenio_archivematica.factories.transfer_cp`.
+
+Copying the files in parallel hides the latency of each file on network
+filesystems, for sips made of many small files.
+"""
+
+ARCHIVEMATICA_TRANSFER_COPY_METHODS = []
+"""Methods tried in order to copy the local files during a transfer.
+
+When the files and the transfer folder are on the same filesystem, the
+files are cloned or copied by the kernel instead of being read and written
+by Python, e.g. with ``['reflink', 'copy_file_range']``. A buffered copy is
+done if no method works. Add ``hardlink`` to link the files: the transfer
+folder then shares the files of the storage, which must never be modified
+in place. See :py:func:`invenio_archivematica.fastcopy.copy_file`.
+
+The local files are then written without the storage factory of the
+archiver (``SIPSTORE_FILE_STORAGE_FACTORY``), so it is disabled by default
+(an empty list).
+"""
+
+ARCHIVEMATICA_TRANSFER_DELTA = False
+"""Only transfer the files changed since the last archive of the record.
+
+When a record is archived again, the data files whose path and checksum
+are the same as in the last registered archive of the record are left out,
+and listed in a ``delta.json`` file of the transfer. See
+:py:func:`invenio_archivematica.factories.delta_files`.
+"""
+
+ARCHIVEMATICA_TRANSFER_MAX_FILES = None
+"""Maximum number of files of a sip copied by
+:py:func:`invenio_archivematica.factories.transfer_cp`.
+
+The transfer of a bigger sip fails. ``None`` means no limit.
+"""
+
+ARCHIVEMATICA_TRANSFER_MAX_SIZE = None
+"""Maximum size in bytes of a sip copied by
+:py:func:`invenio_archivematica.factories.transfer_cp`.
+
+The transfer of a bigger sip fails. ``None`` means no limit.
 """
 
 ARCHIVEMATICA_DASHBOARD_URL = 'http://localhost:81'
@@ -55,3 +193,97 @@ ARCHIVEMATICA_STORAGE_USER = 'invenio'
 
 ARCHIVEMATICA_STORAGE_API_KEY = 'change me'
 """The API key to use with the user above."""
+
+ARCHIVEMATICA_CALLBACK_SECRET = None
+"""Secret shared with Archivematica to authenticate its notifications.
+
+The endpoint ``/oais/callback/`` is disabled if it is not set. See
+:py:class:`invenio_archivematica.views.rest.ArchivematicaCallback`.
+"""
+
+ARCHIVEMATICA_HTTP_POOL_SIZE = 10
+"""Number of connections to Archivematica kept alive by each process."""
+
+ARCHIVEMATICA_HTTP_CONNECT_TIMEOUT = 5
+"""Timeout in seconds to connect to Archivematica."""
+
+ARCHIVEMATICA_HTTP_READ_TIMEOUT = 60
+"""Timeout in seconds to wait for data from Archivematica."""
+
+ARCHIVEMATICA_HTTP_RETRIES = 2
+"""Number of retries of the requests to Archivematica that failed.
+
+Only the connection errors, and the 502, 503 and 504 answers are retried.
+"""
+
+ARCHIVEMATICA_DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+"""Size in bytes of the chunks of the AIPs streamed to the clients."""
+
+ARCHIVEMATICA_DOWNLOAD_FIXITY = False
+"""Verify the checksum of the AIPs while they are downloaded.
+
+The checksum recorded in the pointer file of the AIP by Archivematica is
+compared to the checksum of the streamed content, the result is logged and
+sent with :py:data:`invenio_archivematica.signals.oais_download_verified`.
+Only the compressed AIPs have a pointer file, and partial downloads are not
+verified.
+"""
+
+ARCHIVEMATICA_DOWNLOAD_FIXITY_FATAL = False
+"""Abort the download of an AIP whose checksum does not match.
+
+The connection is closed before the last chunk of the AIP is sent.
+"""
+
+ARCHIVEMATICA_DOWNLOAD_FIXITY_ALGORITHM = 'sha256'
+"""Algorithm of the checksums, if the pointer file of an AIP does not give it.
+"""
+
+ARCHIVEMATICA_DOWNLOAD_OFFLOAD = None
+"""Let the front-end server send the AIPs, instead of the Python process.
+
+- ``'x-accel-redirect'``: nginx proxies the download from Archivematica
+  Storage, through the internal location
+  ``ARCHIVEMATICA_DOWNLOAD_OFFLOAD_LOCATION``.
+- ``'x-sendfile'``: the front-end server sends the file of the AIP, whose
+  path is given by Archivematica Storage. The storage of the AIPs must be
+  mounted at the same path. Uncompressed AIPs are still streamed by Python.
+- ``None``: the AIPs are streamed by Python.
+"""
+
+ARCHIVEMATICA_DOWNLOAD_OFFLOAD_LOCATION = '/_archivematica_storage/'
+"""Internal nginx location mapped to Archivematica Storage.
+
+Used with ``ARCHIVEMATICA_DOWNLOAD_OFFLOAD = 'x-accel-redirect'``, e.g.:
+
+.. code-block:: nginx
+
+    location /_archivematica_storage/ {
+        internal;
+        proxy_pass http://localhost:8001/;
+    }
+"""
+
+ARCHIVEMATICA_AIP_CACHE_DIR = None
+"""Directory keeping the last downloaded AIPs, or None to disable it.
+
+The AIPs are then served from this directory, with
+:py:func:`flask.send_file` (and ``X-Sendfile`` if ``USE_X_SENDFILE`` is
+set).
+"""
+
+ARCHIVEMATICA_AIP_CACHE_SIZE = 100 * 1024 ** 3
+"""Maximum size in bytes of the downloaded AIPs kept in the cache."""
+
+ARCHIVEMATICA_STATUS_CACHE = 'invenio_archivematica.cache.MemoryStatusCache'
+"""Import path of the cache of the real status of the archives.
+
+Use ``invenio_archivematica.cache.InvenioCacheStatusCache`` to share it
+between the processes, or ``None`` to ask Archivematica every time.
+"""
+
+ARCHIVEMATICA_STATUS_CACHE_TTL = 10
+"""Number of seconds the real status of an archive is cached."""
+
+ARCHIVEMATICA_STATUS_CACHE_SIZE = 10000
+"""Maximum number of statuses kept by the in-process cache."""
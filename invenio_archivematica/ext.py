@@ -8,10 +8,15 @@
 
 """Invenio 3 module to connect Invenio to Archivematica."""
 
+from flask import current_app
 from invenio_sipstore.signals import sipstore_created
+from werkzeug.utils import import_string
 
 from . import config
+from .aipcache import AIPCache
+from .client import ArchivematicaClient
 from .listeners import listener_sip_created
+from .models import is_forward_status
 
 
 class InvenioArchivematica(object):
@@ -19,6 +24,7 @@ class InvenioArchivematica(object):
 
     def __init__(self, app=None):
         """Extension initialization."""
+        self._imports = {}
         if app:
             self.init_app(app)
             self.init_listeners()
@@ -26,6 +32,22 @@ class InvenioArchivematica(object):
     def init_app(self, app):
         """Flask application initialization."""
         self.init_config(app)
+        self.client = ArchivematicaClient.from_config(app.config)
+        # resolve the factories once, they are cached by import path
+        for imp in (app.config['ARCHIVEMATICA_TRANSFER_FACTORY'],
+                    app.config['ARCHIVEMATICA_ISARCHIVABLE_FACTORY']):
+            self.import_factory(imp)
+        self.status_cache = None
+        imp = app.config['ARCHIVEMATICA_STATUS_CACHE']
+        if imp and app.config['ARCHIVEMATICA_STATUS_CACHE_TTL']:
+            self.status_cache = import_string(imp)(
+                app.config['ARCHIVEMATICA_STATUS_CACHE_TTL'],
+                app.config['ARCHIVEMATICA_STATUS_CACHE_SIZE'])
+        self.aip_cache = None
+        if app.config['ARCHIVEMATICA_AIP_CACHE_DIR']:
+            self.aip_cache = AIPCache(
+                app.config['ARCHIVEMATICA_AIP_CACHE_DIR'],
+                app.config['ARCHIVEMATICA_AIP_CACHE_SIZE'])
         app.extensions['invenio-archivematica'] = self
 
     def init_config(self, app):
@@ -40,6 +62,69 @@ class InvenioArchivematica(object):
             if k.startswith('ARCHIVEMATICA_'):
                 app.config.setdefault(k, getattr(config, k))
 
+    def import_factory(self, imp):
+        """Return the object of an import path, importing it only once.
+
+        The objects are cached by import path, so changing the configuration
+        (e.g. in the tests) gives the new factory.
+
+        :param imp: the import path, or the object itself
+        :returns: the object, or None if the import path is empty
+        """
+        if not imp:
+            return None
+        if callable(imp):
+            return imp
+        obj = self._imports.get(imp)
+        if obj is None:
+            obj = self._imports[imp] = import_string(imp)
+        return obj
+
+    @property
+    def transfer_factory(self):
+        """The function transferring a sip to Archivematica.
+
+        It is given by the config variable ``ARCHIVEMATICA_TRANSFER_FACTORY``.
+        """
+        return self.import_factory(
+            current_app.config['ARCHIVEMATICA_TRANSFER_FACTORY'])
+
+    @property
+    def isarchivable_factory(self):
+        """The function telling if a sip should be archived, or None.
+
+        It is given by the config variable
+        ``ARCHIVEMATICA_ISARCHIVABLE_FACTORY``.
+        """
+        return self.import_factory(
+            current_app.config['ARCHIVEMATICA_ISARCHIVABLE_FACTORY'])
+
+    def get_real_status(self, status, archivematica_id):
+        """Ask Archivematica the current status of an archive, with a cache.
+
+        The concurrent calls for the same archive send only one request to
+        Archivematica, see :py:class:`invenio_archivematica.cache.StatusCache`.
+
+        The status is cached for the status of the archive in Invenio, and
+        an answer which would move the archive back to a previous status
+        (see :py:func:`invenio_archivematica.models.is_forward_status`) is
+        ignored: the current status is returned instead.
+
+        :param status: the status of the archive in Invenio
+        :param str archivematica_id: the ID of the archive in Archivematica
+        :returns: the status of the archive in Archivematica and its ID
+        """
+        if self.status_cache is None:
+            answer = self.client.get_real_status(status, archivematica_id)
+        else:
+            answer = self.status_cache.get_or_fetch(
+                '{}:{}'.format(archivematica_id, status),
+                lambda: self.client.get_real_status(status,
+                                                    archivematica_id))
+        if not is_forward_status(status, answer[0]):
+            return status, str(archivematica_id)
+        return answer
+
     def init_listeners(self):
         """Register the listener to invenio_sipstore's signals."""
         sipstore_created.connect(listener_sip_created)
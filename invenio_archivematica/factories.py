@@ -8,14 +8,27 @@
 
 """Factories used to customize the behavior of the module."""
 
+import errno
+import json
+import os
+import tarfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from hashlib import md5
+from io import BytesIO
 from os.path import join
-from shutil import rmtree
+from shutil import copyfileobj, rmtree
 from subprocess import call
 
 from flask import current_app
+from invenio_files_rest.models import FileInstance
 from invenio_sipstore.api import SIP
 from invenio_sipstore.archivers import BaseArchiver
+from invenio_sipstore.models import SIPMetadata
+from invenio_sipstore.signals import sipstore_archiver_status
 
+from invenio_archivematica.fastcopy import copy_file
 from invenio_archivematica.models import Archive
 
 
@@ -29,13 +42,19 @@ def create_accession_id(ark):
     """
     return "{service}-{uuid}".format(
         service=current_app.config['ARCHIVEMATICA_ORGANIZATION_NAME'],
-        uuid=ark.sip.id)
+        uuid=ark.sip_id)
 
 
 def transfer_cp(uuid, config):
     """Transfer the files contained in the sip to a local destination.
 
-    The transfer is done with a simple copy of files.
+    The transfer is done with a simple copy of files. The files are copied
+    by :py:data:`invenio_archivematica.config.ARCHIVEMATICA_TRANSFER_WORKERS`
+    threads, with the methods of
+    :py:data:`invenio_archivematica.config.ARCHIVEMATICA_TRANSFER_COPY_METHODS`
+    for the local files. The transfer fails if the sip is bigger than
+    :py:data:`invenio_archivematica.config.ARCHIVEMATICA_TRANSFER_MAX_FILES`
+    or :py:data:`invenio_archivematica.config.ARCHIVEMATICA_TRANSFER_MAX_SIZE`.
 
     This method is automatically called by the module to transfer the files.
     Depending on your installation, you may want to have a different behavior
@@ -51,10 +70,418 @@ def transfer_cp(uuid, config):
     """
     sip = SIP.get_sip(uuid)
     archiver = BaseArchiver(sip)
-    archiver.write_all_files()
+    filesinfo = get_transfer_files(archiver)
+    total_size = sum(fi['size'] for fi in filesinfo)
+    max_files = current_app.config['ARCHIVEMATICA_TRANSFER_MAX_FILES']
+    max_size = current_app.config['ARCHIVEMATICA_TRANSFER_MAX_SIZE']
+    if (max_files is not None and len(filesinfo) > max_files) or \
+            (max_size is not None and total_size > max_size):
+        current_app.logger.warning(
+            'SIP %s: %d files and %d bytes, over the transfer limits',
+            sip.id, len(filesinfo), total_size)
+        return 1
+    workers = current_app.config['ARCHIVEMATICA_TRANSFER_WORKERS']
+    methods = current_app.config['ARCHIVEMATICA_TRANSFER_COPY_METHODS']
+    start = time.time()
+    if methods or (workers > 1 and len(filesinfo) > 1):
+        write_all_files_parallel(archiver, filesinfo, workers, methods)
+    else:
+        archiver.write_all_files(filesinfo)
+    duration = time.time() - start
+    current_app.logger.info(
+        'SIP %s: %d files and %d bytes copied in %.2fs (%.2f MB/s)',
+        sip.id, len(filesinfo), total_size, duration,
+        total_size / 1e6 / max(duration, 1e-6))
     return 0
 
 
+def write_all_files_parallel(archiver, filesinfo, max_workers,
+                             copy_methods=None):
+    """Write the files of a sip like the archiver, with several threads.
+
+    The files keep the layout given by the archiver. The sources are looked
+    up in the database beforehand, so the threads only copy bytes. The
+    signal :py:data:`invenio_sipstore.signals.sipstore_archiver_status` is
+    sent as the files are written.
+
+    :param archiver: the archiver
+    :type archiver: :py:class:`invenio_sipstore.archivers.BaseArchiver`
+    :param list filesinfo: the information about the files, as given by
+        :py:meth:`invenio_sipstore.archivers.BaseArchiver.get_all_files`
+    :param int max_workers: the number of files copied at once
+    :param list copy_methods: if given, the local files are copied with
+        :py:func:`invenio_archivematica.fastcopy.copy_file` and these methods
+    """
+    # the storages can't create the same folder from several threads
+    for folder in set(os.path.dirname(fi['fullpath']) for fi in filesinfo):
+        if os.path.isabs(folder):
+            _makedirs(folder)
+    jobs = []
+    for fi in filesinfo:
+        if 'file_uuid' in fi:
+            src = FileInstance.query.get(fi['file_uuid'])
+            if copy_methods and os.path.isabs(src.uri) and \
+                    os.path.isabs(fi['fullpath']):
+                jobs.append(partial(copy_file, src.uri, fi['fullpath'],
+                                    copy_methods))
+                continue
+            sf = archiver.storage_factory(fileurl=fi['fullpath'],
+                                          size=fi['size'],
+                                          modified=src.updated)
+            jobs.append(partial(sf.copy, src.storage()))
+        elif 'metadata_id' in fi:
+            metadata = SIPMetadata.query.get(
+                (archiver.sip.id, fi['metadata_id']))
+            sf = archiver.storage_factory(fileurl=fi['fullpath'],
+                                          size=fi['size'],
+                                          modified=metadata.updated)
+            jobs.append(partial(
+                sf.save, BytesIO(metadata.content.encode('utf-8'))))
+        else:
+            sf = archiver.storage_factory(fileurl=fi['fullpath'],
+                                          size=fi['size'])
+            jobs.append(partial(
+                sf.save, BytesIO(fi['content'].encode('utf-8'))))
+    total_size = sum(fi['size'] for fi in filesinfo)
+    copied_size = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = dict(
+            (executor.submit(job), fi) for job, fi in zip(jobs, filesinfo))
+        try:
+            for idx, future in enumerate(as_completed(futures), 1):
+                future.result()
+                fi = futures[future]
+                copied_size += fi['size']
+                sipstore_archiver_status.send({
+                    'total_files': len(filesinfo),
+                    'total_size': total_size,
+                    'copied_files': idx,
+                    'copied_size': copied_size,
+                    'current_filename': fi['filepath'],
+                    'current_filesize': fi['size']
+                })
+        except Exception:
+            # we do not start the files left
+            for future in futures:
+                future.cancel()
+            raise
+
+
+def get_transfer_files(archiver):
+    """Return the information about the files of a sip to transfer.
+
+    These are all the files given by the archiver, or only the ones changed
+    since the last archive of the record if
+    :py:data:`invenio_archivematica.config.ARCHIVEMATICA_TRANSFER_DELTA` is
+    set, see :py:func:`invenio_archivematica.factories.delta_files`.
+
+    :param archiver: the archiver of the sip
+    :type archiver: :py:class:`invenio_sipstore.archivers.BaseArchiver`
+    :rtype: list
+    """
+    filesinfo = archiver.get_all_files()
+    if current_app.config['ARCHIVEMATICA_TRANSFER_DELTA']:
+        previous = Archive.get_previous_registered(archiver.sip.id)
+        if previous is not None:
+            filesinfo = delta_files(archiver, filesinfo, previous)
+    return filesinfo
+
+
+def delta_files(archiver, filesinfo, previous):
+    """Remove the files unchanged since a previous archive of the record.
+
+    A data file is unchanged if the sip of the previous archive has a file
+    with the same path and checksum. Instead of the unchanged files, the
+    transfer contains a ``delta.json`` file, giving the IDs of the previous
+    archive and the list of these files. Each unchanged file gives the
+    ``archive`` holding its content: the previous archive, or the one given
+    by the delta of the previous archive if the file was already unchanged
+    then. The delta is also saved in
+    :py:attr:`invenio_archivematica.models.Archive.delta`, so the next
+    archives of the record can read it.
+
+    :param archiver: the archiver of the sip
+    :type archiver: :py:class:`invenio_sipstore.archivers.BaseArchiver`
+    :param list filesinfo: the information about the files, as given by
+        :py:meth:`invenio_sipstore.archivers.BaseArchiver.get_all_files`
+    :param previous: the previous archive
+    :type previous: :py:class:`invenio_archivematica.models.Archive`
+    :rtype: list
+    """
+    previous_files = set(
+        (fi['sipfilepath'], fi['checksum'])
+        for fi in BaseArchiver(SIP(previous.sip)).get_all_files()
+        if 'file_uuid' in fi and fi['checksum'])
+    previous_archive = _delta_archive(previous)
+    # the archives holding the files the previous archive didn't contain
+    holders = dict(
+        ((fi['sipfilepath'], fi['checksum']), fi['archive'])
+        for fi in (previous.delta or {}).get('unchanged', []))
+    changed = []
+    unchanged = []
+    for fi in filesinfo:
+        key = (fi.get('sipfilepath'), fi.get('checksum'))
+        if 'file_uuid' in fi and key in previous_files:
+            unchanged.append({
+                'filepath': fi['filepath'],
+                'sipfilepath': fi['sipfilepath'],
+                'checksum': fi['checksum'],
+                'size': fi['size'],
+                'archive': holders.get(key, previous_archive),
+            })
+        else:
+            changed.append(fi)
+    delta = {'previous': previous_archive, 'unchanged': unchanged}
+    ark = Archive.get_from_sip(archiver.sip.id)
+    if ark is not None:
+        ark.delta = delta
+    content = json.dumps(delta, indent=2, sort_keys=True)
+    filepath = join(archiver.extra_dir, 'delta.json')
+    changed.append(dict(
+        checksum='md5:{}'.format(md5(content.encode('utf-8')).hexdigest()),
+        size=len(content.encode('utf-8')),
+        filepath=filepath,
+        fullpath=archiver.get_fullpath(filepath),
+        content=content,
+    ))
+    return changed
+
+
+def _delta_archive(ark):
+    """Return the IDs of an archive, as written in ``delta.json``."""
+    return {
+        'sip_id': str(ark.sip_id),
+        'accession_id': ark.accession_id,
+        'archivematica_id': str(ark.archivematica_id)
+        if ark.archivematica_id else None,
+    }
+
+
+def _transfer_name(sip):
+    """Return the name of the transfer of a sip: its accession ID."""
+    ark = Archive.get_from_sip(sip.id)
+    return (ark and ark.accession_id) or str(sip.id)
+
+
+def transfer_stream(uuid, config):
+    """Stream the files contained in the sip straight to the destination.
+
+    Unlike :py:func:`invenio_archivematica.factories.transfer_rsync`, the
+    sip is not written to the archiver location first: each file is read
+    from its storage and written to the destination with a buffer of
+    bounded size, so every byte is read and written only once and no
+    staging space is needed. The destination is a local path, such as the
+    transfer source directory of Archivematica or a mounted remote share.
+    The local files are copied with the methods of
+    :py:data:`invenio_archivematica.config.ARCHIVEMATICA_TRANSFER_COPY_METHODS`.
+
+    The files are written in a hidden folder, renamed to the accession ID
+    of the archive once all the files are written, so Archivematica never
+    sees an incomplete transfer.
+
+    .. code-block:: python
+
+        ARCHIVEMATICA_TRANSFER_FACTORY = (
+            'invenio_archivematica.factories.transfer_stream')
+        ARCHIVEMATICA_TRANSFER_FOLDER = {
+            'destination': '/mnt/archivematica/transfers',
+            'buffer_size': 1024 * 1024,
+        }
+
+    :param str uuid: the id of the sip containing files to transfer
+    :param config: the destination folder, or a dict with the
+        ``destination`` folder and optionally the ``buffer_size`` in bytes
+    """
+    if not isinstance(config, dict):
+        config = {'destination': config}
+    sip = SIP.get_sip(uuid)
+    name = _transfer_name(sip)
+    dest_path = join(config['destination'], name)
+    tmp_path = join(config['destination'], '.{}.part'.format(name))
+    filesinfo = get_transfer_files(BaseArchiver(sip))
+    try:
+        write_files(sip, filesinfo, tmp_path,
+                    config.get('buffer_size', 1024 * 1024),
+                    current_app.config['ARCHIVEMATICA_TRANSFER_COPY_METHODS'])
+        # a previous transfer of the sip is replaced
+        rmtree(dest_path, ignore_errors=True)
+        os.rename(tmp_path, dest_path)
+    except Exception:
+        rmtree(tmp_path, ignore_errors=True)
+        raise
+    return 0
+
+
+def write_files(sip, filesinfo, path, buffer_size, copy_methods=None):
+    """Write the files of a sip in a folder.
+
+    :param sip: the sip
+    :type sip: :py:class:`invenio_sipstore.api.SIP`
+    :param list filesinfo: the information about the files, as given by
+        :py:meth:`invenio_sipstore.archivers.BaseArchiver.get_all_files`
+    :param str path: the folder, created if needed
+    :param int buffer_size: the size of the chunks read from the storage
+    :param list copy_methods: the methods to copy the local files, see
+        :py:func:`invenio_archivematica.factories.write_file`
+    """
+    for fileinfo in filesinfo:
+        write_file(sip, fileinfo, join(path, fileinfo['filepath']),
+                   buffer_size, copy_methods)
+
+
+def write_file(sip, fileinfo, path, buffer_size, copy_methods=None):
+    """Write a file of a sip.
+
+    :param sip: the sip
+    :type sip: :py:class:`invenio_sipstore.api.SIP`
+    :param dict fileinfo: the information about the file, see
+        :py:func:`invenio_archivematica.factories.write_files`
+    :param str path: the path of the written file
+    :param int buffer_size: the size of the chunks read from the storage
+    :param list copy_methods: if given, a local file is copied with
+        :py:func:`invenio_archivematica.fastcopy.copy_file` and these methods
+    """
+    if copy_methods and 'file_uuid' in fileinfo:
+        uri = FileInstance.query.get(fileinfo['file_uuid']).uri
+        if os.path.isabs(uri):
+            copy_file(uri, path, copy_methods, buffer_size)
+            return
+    _makedirs(os.path.dirname(path))
+    src, _ = open_file(sip, fileinfo)
+    with src, open(path, 'wb') as dst:
+        copyfileobj(src, dst, buffer_size)
+
+
+def _makedirs(path):
+    """Create a folder and its parents, if they don't exist."""
+    try:
+        os.makedirs(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+
+def open_file(sip, fileinfo):
+    """Open a file of a sip.
+
+    :param sip: the sip
+    :type sip: :py:class:`invenio_sipstore.api.SIP`
+    :param dict fileinfo: the information about the file, see
+        :py:func:`invenio_archivematica.factories.write_files`
+    :returns: the file opened in binary mode, and its size in bytes
+    :rtype: tuple
+    """
+    if 'file_uuid' in fileinfo:
+        f = FileInstance.query.get(fileinfo['file_uuid'])
+        return f.storage().open('rb'), f.size
+    if 'metadata_id' in fileinfo:
+        content = SIPMetadata.query.get(
+            (sip.id, fileinfo['metadata_id'])).content
+    else:
+        content = fileinfo['content']
+    content = content.encode('utf-8')
+    return BytesIO(content), len(content)
+
+
+def transfer_tar(uuid, config):
+    """Transfer the sip as a single tar file.
+
+    The tar file is generated on the fly while the files are read from
+    their storage, so nothing is staged, and the destination receives one
+    file instead of a tree of many small ones. It contains a folder named
+    after the accession ID of the archive, with the layout of
+    :py:func:`invenio_archivematica.factories.transfer_cp`.
+
+    The file is written with a hidden name and renamed once complete. The
+    factory only returns 0 on success, as the others, and does not start
+    the transfer through the API of Archivematica: the type of the transfer
+    is given by the watched directory receiving the file. The destination
+    must thus be the watched directory of the zipped transfers, so the file
+    is unpacked as such.
+
+    .. code-block:: python
+
+        ARCHIVEMATICA_TRANSFER_FACTORY = (
+            'invenio_archivematica.factories.transfer_tar')
+        ARCHIVEMATICA_TRANSFER_FOLDER = {
+            'destination': '/mnt/archivematica/zippedDirectory',
+            'compression': 'gz',
+        }
+
+    The ``zstd`` compression gives a ``.tar.zst`` file. It needs the
+    ``zstd`` extra (``pip install invenio-archivematica[zstd]``), and an
+    Archivematica able to extract such files.
+
+    :param str uuid: the id of the sip containing files to transfer
+    :param config: the destination folder, or a dict with the
+        ``destination`` folder and optionally the ``compression`` (``gz``,
+        ``bz2`` or ``zstd``) and the ``buffer_size`` in bytes
+    """
+    if not isinstance(config, dict):
+        config = {'destination': config}
+    compression = config.get('compression')
+    sip = SIP.get_sip(uuid)
+    name = _transfer_name(sip)
+    filename = '{}.tar{}'.format(name, TAR_SUFFIXES[compression])
+    dest_path = join(config['destination'], filename)
+    tmp_path = join(config['destination'], '.{}.part'.format(filename))
+    filesinfo = get_transfer_files(BaseArchiver(sip))
+    try:
+        with open(tmp_path, 'wb') as f:
+            write_tar(sip, filesinfo, name, f, compression,
+                      config.get('buffer_size', 1024 * 1024))
+        os.rename(tmp_path, dest_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return 0
+
+
+TAR_SUFFIXES = {None: '', 'gz': '.gz', 'bz2': '.bz2', 'zstd': '.zst'}
+"""The suffixes of the tar files after ``.tar``, by compression."""
+
+
+def write_tar(sip, filesinfo, name, fileobj, compression=None,
+              buffer_size=1024 * 1024):
+    """Write the files of a sip as a tar stream.
+
+    :param sip: the sip
+    :type sip: :py:class:`invenio_sipstore.api.SIP`
+    :param list filesinfo: the information about the files, as given by
+        :py:meth:`invenio_sipstore.archivers.BaseArchiver.get_all_files`
+    :param str name: the name of the folder containing the files in the tar
+    :param fileobj: the file object receiving the stream
+    :param str compression: ``gz``, ``bz2``, ``zstd`` or None
+    :param int buffer_size: the size of the chunks read from the storage
+    """
+    zstd = None
+    if compression == 'zstd':
+        import zstandard
+        zstd = zstandard.ZstdCompressor().stream_writer(fileobj)
+        fileobj, compression = zstd, None
+    mode = 'w|{}'.format(compression or '')
+    now = time.time()
+    with tarfile.open(fileobj=fileobj, mode=mode,
+                      bufsize=buffer_size) as tar:
+        info = tarfile.TarInfo(name)
+        info.type = tarfile.DIRTYPE
+        info.mode = 0o755
+        info.mtime = now
+        tar.addfile(info)
+        for fileinfo in filesinfo:
+            src, size = open_file(sip, fileinfo)
+            with src:
+                info = tarfile.TarInfo(join(name, fileinfo['filepath']))
+                info.size = size
+                info.mode = 0o644
+                info.mtime = now
+                tar.addfile(info, src)
+    if zstd is not None:
+        # writes the end of the zstd frame
+        zstd.flush(zstandard.FLUSH_FRAME)
+
+
 def transfer_rsync(uuid, config):
     """Transfer the files contained in the sip to the destination.
 
@@ -88,7 +515,7 @@ def transfer_rsync(uuid, config):
 
     # first we copy everything in a temp folder
     archiver = BaseArchiver(sip)
-    archiver.write_all_files()
+    archiver.write_all_files(get_transfer_files(archiver))
 
     # then we rsync to the final dest
     src_path = archiver.get_fullpath('')
@@ -129,7 +556,7 @@ def transfer_demo(uuid, config):
 
     # we export it to the temp folder
     archiver = BaseArchiver(sip)
-    archiver.write_all_files()
+    archiver.write_all_files(get_transfer_files(archiver))
 
     # we rsync it to the remote
     src_path = archiver.get_fullpath('')
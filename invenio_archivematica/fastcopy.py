@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2017-2019 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Copy of local files avoiding to move their content through Python.
+
+When the source and the destination are on the same filesystem, the
+content does not need to be copied at all (reflink, hard link) or can be
+copied by the kernel (``copy_file_range``, ``sendfile``). The methods are
+tried in the given order, the first one supported by the platform and the
+filesystem is used, and a buffered copy is done if none of them works.
+"""
+
+import errno
+import os
+from shutil import copyfileobj
+
+FICLONE = 0x40049409
+"""The ``ioctl`` request cloning a file on Linux (btrfs, XFS...)."""
+
+
+def _unsupported():
+    return OSError(errno.ENOTSUP, os.strerror(errno.ENOTSUP))
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+
+
+def reflink(src, dst):
+    """Clone a file, sharing its blocks until one of the copies changes."""
+    try:
+        import fcntl
+    except ImportError:
+        raise _unsupported()
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+
+
+def hardlink(src, dst):
+    """Link a file.
+
+    Both paths are the same file afterwards: it must not be modified in
+    place through any of them.
+    """
+    os.link(src, dst)
+
+
+def copy_file_range(src, dst):
+    """Copy a file in the kernel.
+
+    ``os.copy_file_range`` is used where available (it can clone the file
+    on some filesystems), ``os.sendfile`` otherwise.
+    """
+    copy = getattr(os, 'copy_file_range', None)
+    if copy is None:
+        sendfile = getattr(os, 'sendfile', None)
+        if sendfile is None:
+            raise _unsupported()
+
+        def copy(fdin, fdout, count):
+            return sendfile(fdout, fdin, None, count)
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        while size > 0:
+            copied = copy(fsrc.fileno(), fdst.fileno(), size)
+            if copied == 0:
+                # the kernel copied nothing (e.g. special filesystem, or
+                # the file shrank): never keep a truncated copy
+                raise OSError(errno.EIO, 'Incomplete copy', dst)
+            size -= copied
+
+
+METHODS = {
+    'reflink': reflink,
+    'hardlink': hardlink,
+    'copy_file_range': copy_file_range,
+}
+"""The available methods, by name."""
+
+
+def copy_file(src, dst, methods=('reflink', 'copy_file_range'),
+              buffer_size=1024 * 1024):
+    """Copy a local file with the fastest supported method.
+
+    :param str src: the path of the file to copy
+    :param str dst: the path of the copy, its folder is created if needed
+    :param methods: the names of the methods to try, in order, see
+        :py:data:`invenio_archivematica.fastcopy.METHODS`
+    :param int buffer_size: the size of the chunks of the buffered copy
+    :returns: the name of the method used, ``copy`` for the buffered copy
+    :rtype: str
+    """
+    try:
+        os.makedirs(os.path.dirname(dst))
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+    for method in methods:
+        # a new file is always created: truncating a previous hard link
+        # would truncate the linked file too
+        _remove(dst)
+        try:
+            METHODS[method](src, dst)
+            return method
+        except (IOError, OSError):
+            # not supported here, e.g. another filesystem (EXDEV)
+            continue
+    _remove(dst)
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        copyfileobj(fsrc, fdst, buffer_size)
+    return 'copy'
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2017-2019 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Fixity of the AIPs stored in Archivematica."""
+
+import hashlib
+
+
+class FixityError(Exception):
+    """The content of an AIP does not match its checksum."""
+
+    def __init__(self, uuid, expected, computed):
+        """Initialize the error.
+
+        :param str uuid: the ID of the AIP in Archivematica
+        :param str expected: the checksum recorded by Archivematica
+        :param str computed: the checksum of the received content
+        """
+        super(FixityError, self).__init__(
+            'AIP {}: checksum {} instead of {}'.format(
+                uuid, computed, expected))
+        self.uuid = uuid
+        self.expected = expected
+        self.computed = computed
+
+
+def verify_chunks(chunks, uuid, algorithm, expected, callback=None,
+                  fatal=False):
+    """Yield the chunks of an AIP while computing their checksum.
+
+    The checksum is updated with each chunk as it goes, so the AIP is only
+    read once. The last chunk is held back until the checksum is verified:
+    if ``fatal`` is set and the checksum does not match, a
+    :py:class:`invenio_archivematica.fixity.FixityError` is raised instead,
+    so the client never receives a complete corrupted AIP.
+
+    :param chunks: the iterator over the content of the AIP
+    :param str uuid: the ID of the AIP in Archivematica
+    :param str algorithm: the name of the algorithm in :py:mod:`hashlib`
+    :param str expected: the checksum recorded by Archivematica
+    :param callback: the function called with the AIP ID, the expected and
+        the computed checksums once the whole AIP has been read
+    :param bool fatal: raise an error if the checksum does not match
+    """
+    digest = hashlib.new(algorithm)
+    previous = None
+    for chunk in chunks:
+        digest.update(chunk)
+        if previous is not None:
+            yield previous
+        previous = chunk
+    computed = digest.hexdigest()
+    if callback:
+        callback(uuid, expected, computed)
+    if fatal and computed != expected.lower():
+        raise FixityError(uuid, expected, computed)
+    if previous is not None:
+        yield previous
@@ -8,20 +8,23 @@
 
 """Archive models."""
 
+from datetime import datetime
 from enum import Enum
 
 from flask_babelex import gettext
 from invenio_db import db
-from invenio_sipstore.models import SIP
+from invenio_sipstore.models import SIP, RecordSIP
 from speaklater import make_lazy_gettext
+from sqlalchemy.sql import and_, case, literal, or_, select
 from sqlalchemy_utils.models import Timestamp
-from sqlalchemy_utils.types import ChoiceType, UUIDType
+from sqlalchemy_utils.types import ChoiceType, JSONType, UUIDType
 
 _ = make_lazy_gettext(lambda: gettext)
 
 
 ARCHIVE_STATUS_TITLES = {
     'NEW': _('New'),
+    'QUEUED': _('Queued'),
     'WAITING': _('Waiting'),
     'PROCESSING_TRANSFER': _('Processing Transfer'),
     'PROCESSING_AIP': _('Processing AIP'),
@@ -38,6 +41,9 @@ class ArchiveStatus(Enum):
     NEW = 'NEW'
     """The sip has been created or updated, but not yet archived."""
 
+    QUEUED = 'QUEUED'
+    """The sip has been claimed by a scheduler, its transfer will start."""
+
     WAITING = 'WAITING'
     """The sip has been transfered, and is waiting for processing."""
 
@@ -77,6 +83,40 @@ class ArchiveStatus(Enum):
         return ARCHIVE_STATUS_TITLES[self.name]
 
 
+ARCHIVE_PENDING_STATUSES = (
+    ArchiveStatus.NEW,
+    ArchiveStatus.QUEUED,
+    ArchiveStatus.WAITING,
+    ArchiveStatus.PROCESSING_TRANSFER,
+    ArchiveStatus.PROCESSING_AIP,
+)
+"""Status of the archives which are still waiting for Archivematica."""
+
+_PENDING_CONDITION = 'status IN ({})'.format(
+    ', '.join("'{}'".format(status) for status in ARCHIVE_PENDING_STATUSES))
+
+
+def is_forward_status(old, new):
+    """Tell if an archive can go from a status to another one.
+
+    The archives go through the pending statuses in their order, and can
+    not go back to a previous one. A final status (e.g. REGISTERED or
+    FAILED) can replace any status.
+
+    :param old: the current status of the archive
+    :type old: :py:class:`invenio_archivematica.models.ArchiveStatus`
+    :param new: the new status of the archive
+    :type new: :py:class:`invenio_archivematica.models.ArchiveStatus`
+    :rtype: bool
+    """
+    if new not in ARCHIVE_PENDING_STATUSES:
+        return True
+    if old not in ARCHIVE_PENDING_STATUSES:
+        return False
+    return ARCHIVE_PENDING_STATUSES.index(new) >= \
+        ARCHIVE_PENDING_STATUSES.index(old)
+
+
 def status_converter(status, aip_processing=False):
     """Convert a status given by Archivematica into an ArchiveStatus.
 
@@ -119,8 +159,14 @@ class Archive(db.Model, Timestamp):
     __tablename__ = 'archivematica_archive'
     __table_args__ = (
         db.Index('idx_ark_sip', 'sip_id'),
-        db.Index('idx_ark_status', 'status'),
-        db.Index('idx_ark_accession_id', 'accession_id')
+        db.Index('idx_ark_status_updated', 'status', 'updated'),
+        db.Index('idx_ark_accession_id', 'accession_id'),
+        db.Index('idx_ark_status_fixity', 'status', 'fixity_checked_at'),
+        db.Index('idx_ark_archivematica_id', 'archivematica_id'),
+        # only the archives with a pending status, where it is supported
+        db.Index('idx_ark_pending', 'status', 'updated',
+                 postgresql_where=db.text(_PENDING_CONDITION),
+                 sqlite_where=db.text(_PENDING_CONDITION)),
     )
 
     id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'),
@@ -144,6 +190,28 @@ class Archive(db.Model, Timestamp):
     archivematica_id = db.Column(UUIDType, nullable=True)
     """ID of the AIP in Archivematica."""
 
+    next_check_at = db.Column(db.DateTime, nullable=True)
+    """When to ask Archivematica the status of the archive next time."""
+
+    check_attempts = db.Column(db.Integer, nullable=False, default=0,
+                               server_default='0')
+    """Number of times the status was asked since it last changed."""
+
+    fixity_checked_at = db.Column(db.DateTime, nullable=True)
+    """When Archivematica last checked the fixity of the AIP."""
+
+    fixity_ok = db.Column(db.Boolean(name='ck_ark_fixity_ok'), nullable=True)
+    """Result of the last fixity check.
+
+    None if it was never done, or if the last check gave no verdict.
+    """
+
+    delta = db.Column(JSONType, nullable=True)
+    """Files not transferred as unchanged since a previous archive.
+
+    See :py:func:`invenio_archivematica.factories.delta_files`.
+    """
+
     # Relations
     sip = db.relationship(SIP)
     """Relationship with SIP."""
@@ -181,6 +249,31 @@ class Archive(db.Model, Timestamp):
         """
         return cls.query.filter_by(sip_id=uuid).one_or_none()
 
+    @classmethod
+    def get_previous_registered(cls, uuid):
+        """Return the last registered archive of the record of a sip.
+
+        The records are found with
+        :py:class:`invenio_sipstore.models.RecordSIP`. The archives of the
+        sips of these records created before the sip are looked for, and the
+        one of the last created sip is returned.
+
+        :param str uuid: the uuid of the sip
+        :rtype: :py:class:`invenio_archivematica.models.Archive` or None
+        """
+        created = db.session.query(SIP.created).filter(
+            SIP.id == uuid).scalar()
+        if created is None:
+            return None
+        pids = db.session.query(RecordSIP.pid_id).filter(
+            RecordSIP.sip_id == uuid)
+        return cls.query.join(RecordSIP, RecordSIP.sip_id == cls.sip_id) \
+            .join(SIP, SIP.id == cls.sip_id) \
+            .filter(RecordSIP.pid_id.in_(pids),
+                    cls.status == ArchiveStatus.REGISTERED,
+                    SIP.created < created) \
+            .order_by(SIP.created.desc()).first()
+
     @classmethod
     def get_from_accession_id(cls, accession_id):
         """Return the Archive object associated to the given accession_id.
@@ -191,3 +284,196 @@ class Archive(db.Model, Timestamp):
         :rtype: :py:class:`invenio_archivematica.models.Archive` or None
         """
         return cls.query.filter_by(accession_id=accession_id).one_or_none()
+
+    @classmethod
+    def set_status(cls, uuids, status, archivematica_ids=None,
+                   next_check_at=None, only_changed=False, current_status=None,
+                   chunk_size=500):
+        """Change the status of the archives of some sips, in one statement.
+
+        As the status changes, the number of status checks is reset. The
+        changes are not committed, and the Archive objects already loaded in
+        the session are not updated. The sips are changed by chunks of
+        ``chunk_size``, so that a statement never has too many parameters
+        for the database. On PostgreSQL, each chunk is changed by a single
+        ``UPDATE ... RETURNING`` statement. On other databases, the archives
+        to change are selected first.
+
+        :param list uuids: the UUID of the sips
+        :param status: the new status
+        :type status: :py:class:`invenio_archivematica.models.ArchiveStatus`
+        :param dict archivematica_ids: the new archivematica_id of the
+            archives, by UUID of their sip. The archives of the sips missing
+            from it, or given None, keep their archivematica_id.
+        :param datetime next_check_at: when to check the status next time
+        :param bool only_changed: only change the archives which do not have
+            this status and archivematica_id yet. The archives are locked
+            until the end of the transaction, so if the same change is done
+            concurrently, only one of them changes the archives.
+        :param current_status: only change the archives which still have
+            this status, e.g. the one read before asking Archivematica
+        :type current_status:
+            :py:class:`invenio_archivematica.models.ArchiveStatus`
+        :param int chunk_size: the maximum number of sips by statement
+        :returns: the UUID of the sips whose archive has been changed
+        :rtype: list
+        """
+        table = cls.__table__
+        # unlike Query.update, the statements below do not autoflush
+        db.session.flush()
+        uuids = [str(uuid) for uuid in uuids]
+        archivematica_ids = dict((str(uuid), archivematica_id)
+                                 for uuid, archivematica_id
+                                 in (archivematica_ids or {}).items()
+                                 if archivematica_id is not None)
+        changed = []
+        for start in range(0, len(uuids), chunk_size):
+            chunk = uuids[start:start + chunk_size]
+            ids = dict((uuid, archivematica_ids[uuid]) for uuid in chunk
+                       if uuid in archivematica_ids)
+            condition = table.c.sip_id.in_(chunk)
+            if only_changed:
+                condition = and_(condition, cls._differs(status, ids))
+            if current_status is not None:
+                condition = and_(condition, table.c.status == current_status)
+            values = {'status': status,
+                      'updated': datetime.utcnow(),
+                      'next_check_at': next_check_at,
+                      'check_attempts': 0}
+            if ids:
+                id_type = table.c.archivematica_id.type
+                values['archivematica_id'] = case(
+                    [(table.c.sip_id == uuid, literal(aip_id, id_type))
+                     for uuid, aip_id in ids.items()],
+                    else_=table.c.archivematica_id)
+            if db.engine.dialect.name == 'postgresql':
+                sip_ids = [row.sip_id for row in db.session.execute(
+                    table.update()
+                    .where(condition)
+                    .values(**values)
+                    .returning(table.c.sip_id)
+                ).fetchall()]
+            else:
+                sip_ids = [row.sip_id for row in db.session.execute(
+                    select([table.c.sip_id]).where(condition)
+                    .with_for_update()
+                ).fetchall()]
+                if sip_ids:
+                    db.session.execute(
+                        table.update()
+                        .where(table.c.sip_id.in_(sip_ids))
+                        .values(**values))
+            changed.extend(str(sip_id) for sip_id in sip_ids)
+        return changed
+
+    @classmethod
+    def _differs(cls, status, archivematica_ids):
+        """Return the condition of the archives differing from a change."""
+        table = cls.__table__
+        condition = table.c.status != status
+        for uuid, archivematica_id in archivematica_ids.items():
+            condition = or_(condition, and_(
+                table.c.sip_id == uuid,
+                or_(table.c.archivematica_id.is_(None),
+                    table.c.archivematica_id != literal(
+                        archivematica_id, table.c.archivematica_id.type))))
+        return condition
+
+    @classmethod
+    def claim_new(cls, before, limit):
+        """Claim some new archives, to start their transfer.
+
+        The claimed archives go from the NEW status to the QUEUED status
+        atomically, so a same archive can't be claimed twice, even by
+        schedulers running in parallel. The oldest archives are claimed
+        first. On PostgreSQL, a single statement
+        claims all the archives, skipping those locked by another
+        transaction. On other databases, the archives are claimed one by
+        one, if they are still new.
+
+        The changes are not committed.
+
+        :param datetime before: claim only the archives updated before
+        :param int limit: the maximum number of archives to claim
+        :returns: the ID of the claimed archives and the ID of their sip,
+            ordered by ID
+        :rtype: list
+        """
+        table = cls.__table__
+        candidates = select([table.c.id]).where(
+            (table.c.status == ArchiveStatus.NEW) &
+            (table.c.updated <= before)
+        ).order_by(table.c.updated, table.c.id).limit(limit)
+        values = {'status': ArchiveStatus.QUEUED,
+                  'updated': datetime.utcnow()}
+        if db.engine.dialect.name == 'postgresql':
+            candidates = candidates.with_for_update(skip_locked=True)
+            claimed = db.session.execute(
+                table.update()
+                .where(table.c.id.in_(candidates))
+                .values(**values)
+                .returning(table.c.id, table.c.sip_id)
+            ).fetchall()
+            return sorted((row.id, row.sip_id) for row in claimed)
+        claimed = []
+        for row in db.session.execute(
+                candidates.with_only_columns([table.c.id, table.c.sip_id])
+        ).fetchall():
+            result = db.session.execute(
+                table.update()
+                .where((table.c.id == row.id) &
+                       (table.c.status == ArchiveStatus.NEW))
+                .values(**values)
+            )
+            if result.rowcount == 1:
+                claimed.append((row.id, row.sip_id))
+        return sorted(claimed)
+
+    @classmethod
+    def release_queued(cls, before):
+        """Give back the NEW status to the archives queued for too long.
+
+        An archive stays QUEUED if its transfer was claimed but never
+        started, e.g. the Celery message was lost or the worker died, so it
+        is released to be claimed again. The ``updated`` date is kept, so
+        the archive can be claimed by the same run.
+
+        The changes are not committed.
+
+        :param datetime before: release only the archives queued before
+        :returns: the number of released archives
+        :rtype: int
+        """
+        table = cls.__table__
+        return db.session.execute(
+            table.update()
+            .where((table.c.status == ArchiveStatus.QUEUED) &
+                   (table.c.updated <= before))
+            .values(status=ArchiveStatus.NEW, updated=table.c.updated)
+        ).rowcount
+
+    @classmethod
+    def iter_chunks(cls, query, chunk_size, after_id=None):
+        """Iterate over the rows of a query, chunk by chunk.
+
+        The rows are walked in the order of their ID using keyset pagination,
+        so fetching a chunk costs the same wherever it is in the table, and
+        only one chunk is held in memory at a time.
+
+        :param query: the query to walk. It must select the Archive entity,
+            or at least its ``id`` column.
+        :param int chunk_size: the maximum number of rows in a chunk
+        :param int after_id: only return the rows with a greater ID
+        :returns: an iterator over lists of rows
+        """
+        while True:
+            chunk_query = query
+            if after_id is not None:
+                chunk_query = chunk_query.filter(cls.id > after_id)
+            chunk = chunk_query.order_by(cls.id).limit(chunk_size).all()
+            if not chunk:
+                return
+            yield chunk
+            if len(chunk) < chunk_size:
+                return
+            after_id = chunk[-1].id
@@ -39,3 +39,17 @@ oais_transfer_finished = _signals.signal('oais_transfer_finished')
 
 oais_transfer_failed = _signals.signal('oais_transfer_failed')
 """Signal sent when a transfer has failed."""
+
+oais_download_verified = _signals.signal('oais_download_verified')
+"""Signal sent when the checksum of a downloaded AIP has been verified.
+
+Send the ID of the AIP in Archivematica as the sender, and the
+``expected`` and ``computed`` checksums as keyword arguments.
+"""
+
+oais_fixity_failed = _signals.signal('oais_fixity_failed')
+"""Signal sent when the fixity check of an AIP has failed.
+
+Send the sip as the sender, and the ``report`` of Archivematica as a
+keyword argument.
+"""
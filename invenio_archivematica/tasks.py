@@ -8,17 +8,24 @@
 
 """Tasks used by invenio-archivematica."""
 
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 from celery import shared_task
 from flask import current_app
 from invenio_db import db
 from invenio_sipstore.api import SIP
-from werkzeug.utils import import_string
+from invenio_sipstore.models import SIP as SIPModel
+from requests.exceptions import HTTPError, RequestException
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import load_only
 
 from invenio_archivematica.models import Archive, ArchiveStatus
-from invenio_archivematica.signals import oais_transfer_failed, \
-    oais_transfer_finished, oais_transfer_processing, oais_transfer_started
+from invenio_archivematica.proxies import current_archivematica
+from invenio_archivematica.signals import oais_fixity_failed, \
+    oais_transfer_failed, oais_transfer_finished, oais_transfer_processing, \
+    oais_transfer_started
 
 
 @shared_task(ignore_result=True)
@@ -44,9 +51,10 @@ def oais_start_transfer(uuid, accession_id='', archivematica_id=None):
         ark = Archive.create(sip.model)
     ark.accession_id = accession_id
     ark.status = ArchiveStatus.WAITING
+    ark.check_attempts = 0
+    ark.next_check_at = _next_check_at()
     # we start the transfer
-    imp = current_app.config['ARCHIVEMATICA_TRANSFER_FACTORY']
-    transfer = import_string(imp)
+    transfer = current_archivematica.transfer_factory
     ret = transfer(sip.id, current_app.config['ARCHIVEMATICA_TRANSFER_FOLDER'])
     if ret == 0:
         db.session.commit()
@@ -69,12 +77,8 @@ def oais_process_transfer(uuid, accession_id='', archivematica_id=None):
     :param str uuid: the UUID of the sip
     :param str archivematica_id: the ID of the AIP in Archivematica
     """
-    ark = Archive.get_from_sip(uuid)
-    ark.status = ArchiveStatus.PROCESSING_TRANSFER
-    ark.archivematica_id = archivematica_id
-
-    db.session.commit()
-    oais_transfer_processing.send(SIP(ark.sip))
+    oais_change_status_bulk([uuid], ArchiveStatus.PROCESSING_TRANSFER,
+                            {uuid: archivematica_id})
 
 
 @shared_task(ignore_result=True)
@@ -91,12 +95,8 @@ def oais_process_aip(uuid, accession_id='', archivematica_id=None):
     :param str uuid: the UUID of the sip
     :param str archivematica_id: the ID of the AIP in Archivematica
     """
-    ark = Archive.get_from_sip(uuid)
-    ark.status = ArchiveStatus.PROCESSING_AIP
-    ark.archivematica_id = archivematica_id
-
-    db.session.commit()
-    oais_transfer_processing.send(SIP(ark.sip))
+    oais_change_status_bulk([uuid], ArchiveStatus.PROCESSING_AIP,
+                            {uuid: archivematica_id})
 
 
 @shared_task(ignore_result=True)
@@ -114,13 +114,8 @@ def oais_finish_transfer(uuid, accession_id='', archivematica_id=None):
     :param str archivematica_id: the ID in Archivematica of the created AIP
         (should be an UUID)
     """
-    ark = Archive.get_from_sip(uuid)
-    ark.status = ArchiveStatus.REGISTERED
-    ark.archivematica_id = archivematica_id
-    ark.sip.archived = True
-
-    db.session.commit()
-    oais_transfer_finished.send(SIP(ark.sip))
+    oais_change_status_bulk([uuid], ArchiveStatus.REGISTERED,
+                            {uuid: archivematica_id})
 
 
 @shared_task(ignore_result=True)
@@ -135,22 +130,133 @@ def oais_fail_transfer(uuid, accession_id='', archivematica_id=None):
 
     :param str uuid: the UUID of the sip
     """
-    ark = Archive.get_from_sip(uuid)
-    ark.status = ArchiveStatus.FAILED
-    ark.sip.archived = False
+    oais_change_status_bulk([uuid], ArchiveStatus.FAILED)
+
+
+_status_signals = {
+    ArchiveStatus.PROCESSING_TRANSFER: oais_transfer_processing,
+    ArchiveStatus.PROCESSING_AIP: oais_transfer_processing,
+    ArchiveStatus.REGISTERED: oais_transfer_finished,
+    ArchiveStatus.FAILED: oais_transfer_failed,
+}
+"""Signal sent for each status that can be changed in bulk."""
+
+_sip_archived = {
+    ArchiveStatus.REGISTERED: True,
+    ArchiveStatus.FAILED: False,
+}
+"""The archived flag of the sips, for the final status."""
+
+
+@shared_task(ignore_result=True)
+def oais_change_status_bulk(uuids, status, archivematica_ids=None,
+                            notify_async=False, only_changed=False,
+                            current_status=None):
+    """Change the status of many sips at once.
+
+    The archives of all the sips are changed with a single UPDATE statement
+    and a single commit, without loading them. Then, the signal of the
+    status is sent for each sip whose archive has been changed, if it has
+    any receiver: the sips are only loaded in this case. It is also used
+    for a single sip by
+    :py:func:`invenio_archivematica.tasks.oais_process_transfer`,
+    :py:func:`invenio_archivematica.tasks.oais_process_aip`,
+    :py:func:`invenio_archivematica.tasks.oais_finish_transfer` and
+    :py:func:`invenio_archivematica.tasks.oais_fail_transfer`.
+
+    :param list uuids: the UUID of the sips
+    :param str status: the new status: PROCESSING_TRANSFER, PROCESSING_AIP,
+        REGISTERED or FAILED
+    :param dict archivematica_ids: the ID of the AIPs in Archivematica, by
+        UUID of their sip. Missing sips keep their current ID.
+    :param bool notify_async: only save the new status of the archives,
+        and update the sips and send the signals in
+        :py:func:`invenio_archivematica.tasks.oais_notify_status`, which
+        is enqueued after the commit
+    :param bool only_changed: only change the archives which do not have
+        this status and archivematica_id yet, see
+        :py:meth:`invenio_archivematica.models.Archive.set_status`
+    :param str current_status: only change the archives which still have
+        this status
+    :returns: the UUID of the sips whose archive has been changed
+    :rtype: list
+    """
+    status = _bulk_status(status)
+    if current_status is not None:
+        current_status = ArchiveStatus(str(current_status))
+    changed = Archive.set_status(uuids, status, archivematica_ids,
+                                 next_check_at=_next_check_at(),
+                                 only_changed=only_changed,
+                                 current_status=current_status)
+    if notify_async:
+        db.session.commit()
+        if changed:
+            oais_notify_status.delay(changed, str(status))
+    else:
+        _notify_status(changed, status)
+    return changed
+
 
+@shared_task(ignore_result=True)
+def oais_notify_status(uuids, status):
+    """Finish the change of status of many sips.
+
+    The archived flag of the sips is updated, and the signal of the status
+    is sent for each sip. The status of their archives must have been
+    changed already, see
+    :py:func:`invenio_archivematica.tasks.oais_change_status_bulk`.
+
+    :param list uuids: the UUID of the sips
+    :param str status: the new status: PROCESSING_TRANSFER, PROCESSING_AIP,
+        REGISTERED or FAILED
+    """
+    _notify_status(list(uuids), _bulk_status(status))
+
+
+def _bulk_status(status):
+    """Return a status which can be changed in bulk, or raise an error."""
+    status = ArchiveStatus(str(status))
+    if status not in _status_signals:
+        raise ValueError('Status {} can not be changed in bulk.'.format(
+            status))
+    return status
+
+
+def _notify_status(uuids, status):
+    """Update the sips, commit, and send the signals of a new status."""
+    if status in _sip_archived:
+        SIPModel.query.filter(SIPModel.id.in_(uuids)).update(
+            {'archived': _sip_archived[status]}, synchronize_session=False)
     db.session.commit()
-    oais_transfer_failed.send(SIP(ark.sip))
+    signal = _status_signals[status]
+    if signal.receivers:
+        for sip in SIPModel.query.filter(SIPModel.id.in_(uuids)):
+            signal.send(SIP(sip))
 
 
 @shared_task(ignore_result=True)
 def archive_new_sips(accession_id_factory, days=30, hours=0, minutes=0,
-                     seconds=0, delay=True):
+                     seconds=0, delay=True, chunk_size=None,
+                     batch_size=None, max_sips=None):
     """Start the archive process for some sip.
 
     All the new sip that have been created at least since `nb_days` will be
     archived.
 
+    The archives are claimed by chunks of `chunk_size`, ordered by their ID,
+    so the memory used by the task does not depend on the number of new
+    sips. A claimed archive gets the QUEUED status (see
+    :py:meth:`invenio_archivematica.models.Archive.claim_new`), thus
+    several runs of this task can run in parallel without starting the same
+    transfer twice. The archives still QUEUED after
+    :py:data:`invenio_archivematica.config.ARCHIVEMATICA_QUEUED_TIMEOUT` are
+    claimed again. Only the ID of the archive and of its sip are loaded, so
+    the accession ID factory should not need anything else.
+
+    When delayed, the transfers are sent to Celery by batches of
+    `batch_size` transfers per message. At most `max_sips` sips are sent by
+    a run, the others are left for the next run.
+
     To trigger this task everyday at 1 am, you can add this variable in your
     config:
 
@@ -184,20 +290,372 @@ def archive_new_sips(accession_id_factory, days=30, hours=0, minutes=0,
     :param int minutes: number of minutes
     :param int seconds: number of seconds
     :param bool delay: tells if we should delay the transfers
+    :param int chunk_size: number of archives to claim at once. Defaults to
+        :py:data:`invenio_archivematica.config.ARCHIVEMATICA_SCAN_CHUNK_SIZE`
+    :param int batch_size: number of transfers per Celery message. Defaults
+        to the config variable ``ARCHIVEMATICA_DISPATCH_BATCH_SIZE``
+    :param int max_sips: maximum number of sips to archive in this run.
+        Defaults to the config variable ``ARCHIVEMATICA_MAX_SIPS_PER_RUN``
+    :returns: the number of sips sent to archive (``enqueued``) and the
+        number of sips left for the next run (``deferred``)
+    :rtype: dict
     """
     # first we get all the sip we need to archive
     begin_date = datetime.utcnow() - timedelta(days=days,
                                                hours=hours,
                                                minutes=minutes,
                                                seconds=seconds)
-    arks = Archive.query.filter(
-        Archive.status == ArchiveStatus.NEW,
-        Archive.updated <= str(begin_date)).all()
-    facto = import_string(accession_id_factory)
+    chunk_size = chunk_size or \
+        current_app.config['ARCHIVEMATICA_SCAN_CHUNK_SIZE']
+    batch_size = batch_size or \
+        current_app.config['ARCHIVEMATICA_DISPATCH_BATCH_SIZE']
+    if max_sips is None:
+        max_sips = current_app.config['ARCHIVEMATICA_MAX_SIPS_PER_RUN']
+    facto = current_archivematica.import_factory(accession_id_factory)
+    queued_timeout = current_app.config['ARCHIVEMATICA_QUEUED_TIMEOUT']
+    if queued_timeout is not None:
+        # the transfers claimed but never started are claimed again
+        released = Archive.release_queued(
+            datetime.utcnow() - timedelta(seconds=queued_timeout))
+        db.session.commit()
+        if released:
+            current_app.logger.warning(
+                'Archive new sips: %d queued sips released.', released)
     # we start the transfer for all the founded sip
-    for ark in arks:
-        accession_id = facto(ark)
-        if delay:
-            oais_start_transfer.delay(ark.sip.id, accession_id)
-        else:
-            oais_start_transfer(ark.sip.id, accession_id)
+    enqueued = 0
+    while max_sips is None or enqueued < max_sips:
+        limit = chunk_size
+        if max_sips is not None:
+            limit = min(chunk_size, max_sips - enqueued)
+        # we claim the archives, so no other run can start them
+        claimed = Archive.claim_new(begin_date, limit)
+        db.session.commit()
+        if not claimed:
+            break
+        ids = [ark_id for ark_id, sip_id in claimed]
+        arks = Archive.query.options(load_only('id', 'sip_id')).filter(
+            Archive.id.in_(ids)).order_by(Archive.id).all()
+        transfers = [(str(ark.sip_id), facto(ark)) for ark in arks]
+        try:
+            if delay:
+                _dispatch_transfers(transfers, batch_size)
+            else:
+                for args in transfers:
+                    oais_start_transfer(*args)
+        except Exception:
+            # we release the archives not started for the next run
+            db.session.rollback()
+            Archive.query.filter(
+                Archive.id.in_(ids),
+                Archive.status == ArchiveStatus.QUEUED
+            ).update({'status': ArchiveStatus.NEW},
+                     synchronize_session=False)
+            db.session.commit()
+            raise
+        enqueued += len(transfers)
+        # we don't keep the transaction open between two chunks
+        db.session.commit()
+    deferred = Archive.query.filter(
+        Archive.status == ArchiveStatus.NEW,
+        Archive.updated <= str(begin_date)).count()
+    current_app.logger.info(
+        'Archive new sips: %d sips enqueued, %d deferred to the next run.',
+        enqueued, deferred)
+    return {'enqueued': enqueued, 'deferred': deferred}
+
+
+def _dispatch_transfers(transfers, batch_size):
+    """Send the transfers to Celery, `batch_size` transfers per message.
+
+    :param list transfers: the arguments of
+        :py:func:`invenio_archivematica.tasks.oais_start_transfer`
+    :param int batch_size: the number of transfers per message
+    """
+    if batch_size > 1:
+        oais_start_transfer.chunks(transfers, batch_size).apply_async()
+    else:
+        for args in transfers:
+            oais_start_transfer.delay(*args)
+
+
+@shared_task(ignore_result=True)
+def oais_reconcile_archives(chunk_size=None, max_workers=None):
+    """Update the status of the archives being processed by Archivematica.
+
+    The archives which are WAITING, PROCESSING_TRANSFER or PROCESSING_AIP,
+    and whose ID in Archivematica is known, are read by chunks. For each
+    chunk, Archivematica is asked the status of the archives by a pool of
+    `max_workers` threads, then the archives are changed with one
+    :py:func:`invenio_archivematica.tasks.oais_change_status_bulk` per new
+    status. An archive is only changed if it still has the status read
+    before the requests, so a change done meanwhile (e.g. by a callback of
+    Archivematica) is never overwritten.
+
+    An archive is only checked once its ``next_check_at`` date is passed.
+    Each check which does not change its status doubles the delay before
+    the next one, from ``ARCHIVEMATICA_POLL_BASE_DELAY`` up to
+    ``ARCHIVEMATICA_POLL_MAX_DELAY``, and each change of status resets it.
+    Thus the number of requests follows the number of changes rather than
+    the number of archives being processed.
+
+    To update the status every 5 minutes, you can add this variable in your
+    config:
+
+    .. code-block:: python
+
+        from datetime import timedelta
+        CELERYBEAT_SCHEDULE = {
+            'reconcile-archives': {
+                'task':
+                    'invenio_archivematica.tasks.oais_reconcile_archives',
+                'schedule': timedelta(minutes=5),
+            }
+        }
+
+    :param int chunk_size: number of archives to read at once. Defaults to
+        :py:data:`invenio_archivematica.config.ARCHIVEMATICA_SCAN_CHUNK_SIZE`
+    :param int max_workers: number of concurrent requests to Archivematica.
+        Defaults to the config variable ``ARCHIVEMATICA_RECONCILE_WORKERS``
+    :returns: the number of archives changed, by new status
+    :rtype: dict
+    """
+    chunk_size = chunk_size or \
+        current_app.config['ARCHIVEMATICA_SCAN_CHUNK_SIZE']
+    max_workers = max_workers or \
+        current_app.config['ARCHIVEMATICA_RECONCILE_WORKERS']
+    query = db.session.query(
+        Archive.id, Archive.sip_id, Archive.status, Archive.archivematica_id,
+        Archive.check_attempts
+    ).filter(
+        Archive.status.in_([ArchiveStatus.WAITING,
+                            ArchiveStatus.PROCESSING_TRANSFER,
+                            ArchiveStatus.PROCESSING_AIP]),
+        Archive.archivematica_id.isnot(None),
+        or_(Archive.next_check_at.is_(None),
+            Archive.next_check_at <= datetime.utcnow()))
+    client = current_archivematica.client
+    logger = current_app.logger
+    changed = defaultdict(int)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for rows in Archive.iter_chunks(query, chunk_size):
+            # we don't keep the transaction open during the requests
+            db.session.commit()
+            transitions = defaultdict(dict)
+            unchanged = defaultdict(list)
+            results = executor.map(
+                lambda row: _fetch_real_status(client, logger, row), rows)
+            for row, result in zip(rows, results):
+                if result is not None:
+                    status, archivematica_id = result
+                    if status == row.status \
+                            and archivematica_id == str(row.archivematica_id):
+                        result = None
+                    elif status not in _status_signals:
+                        current_app.logger.warning(
+                            'Archive %s: unexpected status %s in '
+                            'Archivematica.', row.sip_id, status)
+                        result = None
+                if result is None:
+                    delay = _check_delay(row.check_attempts + 1)
+                    unchanged[delay].append(row.id)
+                else:
+                    transitions[row.status, status][str(row.sip_id)] = \
+                        archivematica_id
+            for (current, status), archivematica_ids in transitions.items():
+                uuids = oais_change_status_bulk(
+                    list(archivematica_ids), status, archivematica_ids,
+                    current_status=current)
+                if uuids:
+                    changed[str(status)] += len(uuids)
+            # we check the unchanged archives less and less often
+            for delay, ids in unchanged.items():
+                Archive.query.filter(Archive.id.in_(ids)).update({
+                    'check_attempts': Archive.check_attempts + 1,
+                    'next_check_at':
+                        datetime.utcnow() + timedelta(seconds=delay)
+                }, synchronize_session=False)
+            db.session.commit()
+    finally:
+        executor.shutdown()
+    return dict(changed)
+
+
+@shared_task(ignore_result=True)
+def oais_audit_fixity(chunk_size=None, max_workers=None, max_archives=None):
+    """Ask Archivematica to check the fixity of the registered AIPs.
+
+    The REGISTERED archives which have never been checked, or not for
+    ``ARCHIVEMATICA_FIXITY_INTERVAL`` seconds, are read by chunks in the
+    order of their ID. For each chunk, Archivematica Storage checks the
+    fixity of the AIPs with `max_workers` concurrent requests, then the
+    date and the result of the checks are saved.
+
+    A run stops after `max_archives` checks; as the checked archives are
+    not selected again until the interval is over, the next run continues
+    where this one stopped. Thus a full sweep of a large repository can be
+    spread over many runs, e.g. every night:
+
+    .. code-block:: python
+
+        from celery.schedules import crontab
+        CELERYBEAT_SCHEDULE = {
+            'audit-fixity': {
+                'task': 'invenio_archivematica.tasks.oais_audit_fixity',
+                'schedule': crontab(minute=0, hour=2),
+            }
+        }
+
+    The AIPs whose fixity check fails are logged, and the signal
+    :py:data:`invenio_archivematica.signals.oais_fixity_failed` is sent for
+    them, as well as for the AIPs missing in Archivematica Storage. The
+    checks which give no verdict (e.g. Archivematica is not available) are
+    saved without a result, and done again after
+    ``ARCHIVEMATICA_FIXITY_RETRY_DELAY`` seconds. They are not counted in
+    `max_archives`, so AIPs which can never be checked do not stall the
+    sweep.
+
+    :param int chunk_size: number of archives to read at once. Defaults to
+        :py:data:`invenio_archivematica.config.ARCHIVEMATICA_SCAN_CHUNK_SIZE`
+    :param int max_workers: number of concurrent checks. Defaults to the
+        config variable ``ARCHIVEMATICA_FIXITY_WORKERS``
+    :param int max_archives: maximum number of checks of this run. Defaults
+        to the config variable ``ARCHIVEMATICA_FIXITY_MAX_PER_RUN``
+    :returns: the number of archives checked, by result (``ok``,
+        ``failed`` and ``error``)
+    :rtype: dict
+    """
+    config = current_app.config
+    chunk_size = chunk_size or config['ARCHIVEMATICA_SCAN_CHUNK_SIZE']
+    max_workers = max_workers or config['ARCHIVEMATICA_FIXITY_WORKERS']
+    if max_archives is None:
+        max_archives = config['ARCHIVEMATICA_FIXITY_MAX_PER_RUN']
+    timeout = (config['ARCHIVEMATICA_HTTP_CONNECT_TIMEOUT'],
+               config['ARCHIVEMATICA_FIXITY_TIMEOUT'])
+    now = datetime.utcnow()
+    before = now - timedelta(seconds=config['ARCHIVEMATICA_FIXITY_INTERVAL'])
+    retry_before = now - timedelta(
+        seconds=config['ARCHIVEMATICA_FIXITY_RETRY_DELAY'])
+    query = db.session.query(
+        Archive.id, Archive.sip_id, Archive.archivematica_id
+    ).filter(
+        Archive.status == ArchiveStatus.REGISTERED,
+        Archive.archivematica_id.isnot(None),
+        or_(Archive.fixity_checked_at.is_(None),
+            Archive.fixity_checked_at < before,
+            and_(Archive.fixity_ok.is_(None),
+                 Archive.fixity_checked_at < retry_before)))
+    client = current_archivematica.client
+    logger = current_app.logger
+    checked = defaultdict(int)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for rows in Archive.iter_chunks(query, chunk_size):
+            # we don't keep the transaction open during the checks
+            db.session.commit()
+            if max_archives is not None:
+                rows = rows[:max_archives - _fixity_verdicts(checked)]
+            reports = executor.map(
+                lambda row: _check_fixity(client, logger, timeout, row),
+                rows)
+            results = defaultdict(list)
+            for row, report in zip(rows, reports):
+                if report is None:
+                    # no verdict, the archive is checked again sooner
+                    results[None].append(row.id)
+                    checked['error'] += 1
+                elif report.get('success'):
+                    results[True].append(row.id)
+                    checked['ok'] += 1
+                else:
+                    logger.error('Archive %s: the fixity check of its AIP '
+                                 'failed: %s', row.sip_id,
+                                 report.get('message'))
+                    sip = SIP(SIPModel.query.get(row.sip_id))
+                    oais_fixity_failed.send(sip, report=report)
+                    results[False].append(row.id)
+                    checked['failed'] += 1
+            now = datetime.utcnow()
+            for result, ids in results.items():
+                Archive.query.filter(Archive.id.in_(ids)).update({
+                    'fixity_checked_at': now,
+                    'fixity_ok': result
+                }, synchronize_session=False)
+            db.session.commit()
+            if max_archives is not None \
+                    and _fixity_verdicts(checked) >= max_archives:
+                break
+    finally:
+        executor.shutdown()
+    return dict(checked)
+
+
+def _check_fixity(client, logger, timeout, row):
+    """Ask Archivematica to check the fixity of an AIP, from a thread.
+
+    :param client: the client of Archivematica
+    :type client: :py:class:`invenio_archivematica.client.ArchivematicaClient`
+    :param logger: the logger of the application
+    :param timeout: the timeouts of the request
+    :param row: the archive, with its ``sip_id`` and ``archivematica_id``
+    :returns: the report of Archivematica, or None if it failed
+    """
+    try:
+        return client.check_fixity(row.archivematica_id, timeout=timeout)
+    except HTTPError as e:
+        if e.response is not None and e.response.status_code == 404:
+            # the AIP is lost, this is a failed check
+            return {'success': False,
+                    'message': 'AIP not found in Archivematica Storage.'}
+        logger.warning('Archive %s: cannot check the fixity of its AIP: '
+                       '%s', row.sip_id, e)
+        return None
+    except (RequestException, ValueError) as e:
+        logger.warning('Archive %s: cannot check the fixity of its AIP: '
+                       '%s', row.sip_id, e)
+        return None
+
+
+def _fixity_verdicts(checked):
+    """Return the number of fixity checks which gave a verdict."""
+    return checked.get('ok', 0) + checked.get('failed', 0)
+
+
+def _check_delay(attempts):
+    """Return the delay before checking the status of an archive again.
+
+    :param int attempts: the number of checks since the status changed
+    :returns: the delay, in seconds
+    :rtype: int
+    """
+    return min(
+        current_app.config['ARCHIVEMATICA_POLL_BASE_DELAY'] *
+        2 ** min(attempts, 32),
+        current_app.config['ARCHIVEMATICA_POLL_MAX_DELAY'])
+
+
+def _next_check_at(attempts=0):
+    """Return when to check the status of an archive again.
+
+    :param int attempts: the number of checks since the status changed
+    :rtype: datetime
+    """
+    return datetime.utcnow() + timedelta(seconds=_check_delay(attempts))
+
+
+def _fetch_real_status(client, logger, row):
+    """Ask Archivematica the status of an archive, from a worker thread.
+
+    :param client: the client of Archivematica
+    :type client: :py:class:`invenio_archivematica.client.ArchivematicaClient`
+    :param logger: the logger of the application
+    :param row: the archive, with its ``sip_id``, ``status`` and
+        ``archivematica_id``
+    :returns: the status and the ID in Archivematica, or None if it failed
+    """
+    try:
+        return client.get_real_status(row.status, row.archivematica_id)
+    except (RequestException, KeyError, ValueError) as e:
+        logger.warning('Archive %s: cannot get its status from '
+                       'Archivematica: %s', row.sip_id, e)
+        return None
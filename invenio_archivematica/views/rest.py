@@ -8,25 +8,37 @@
 
 """Invenio-Archivematica REST API views."""
 
+import hashlib
+import hmac
+import os
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
 
-import requests
 from flask import Blueprint, Response, abort, current_app, jsonify, \
-    make_response, stream_with_context
+    make_response, request, send_file, stream_with_context, url_for
 from invenio_access.permissions import Permission
 from invenio_db import db
 from invenio_oauth2server import require_api_auth, require_oauth_scopes
 from invenio_rest import ContentNegotiatedMethodView
-from requests.exceptions import ConnectionError
+from requests.exceptions import ConnectionError, HTTPError, RequestException
 from webargs import fields
 from webargs.flaskparser import use_kwargs
 from werkzeug.datastructures import Headers
+from werkzeug.http import is_hop_by_hop_header
 
-from invenio_archivematica.api import change_status_func
+from invenio_archivematica.api import change_status_async, \
+    change_status_bulk_func, change_status_func
+from invenio_archivematica.fixity import verify_chunks
 from invenio_archivematica.models import Archive as Archive_
-from invenio_archivematica.models import ArchiveStatus, status_converter
+from invenio_archivematica.models import ArchiveStatus, is_forward_status, \
+    status_converter
 from invenio_archivematica.permissions import _action2need_map
+from invenio_archivematica.proxies import current_archivematica
 from invenio_archivematica.scopes import archive_scope
+from invenio_archivematica.signals import oais_download_verified
+from invenio_archivematica.tasks import oais_change_status_bulk
 
 blueprint = Blueprint(
     'invenio_archivematica_api',
@@ -63,6 +75,36 @@ def check_permission(permission):
     return decorator
 
 
+def filter_permission(archives, permission):
+    """Split the archives between the allowed and the forbidden ones.
+
+    The global permission is checked first, so the archives are checked
+    one by one only for the users who have not been granted it.
+
+    :param list archives: the archives
+    :param str permission: the action, such as ``archive-read``
+    :returns: the allowed archives and the forbidden archives
+    :rtype: tuple
+    """
+    need = _action2need_map[permission]
+    if Permission(need(None)).can():
+        return list(archives), []
+    allowed, forbidden = [], []
+    for ark in archives:
+        if Permission(need(ark.accession_id)).can():
+            allowed.append(ark)
+        else:
+            forbidden.append(ark)
+    return allowed, forbidden
+
+
+def to_utc(date):
+    """Return a date as a naive UTC date, as stored in the database."""
+    if date is None or date.utcoffset() is None:
+        return date
+    return date.replace(tzinfo=None) - date.utcoffset()
+
+
 def validate_status(status):
     """Accept only valid status."""
     try:
@@ -85,20 +127,29 @@ class Archive(ContentNegotiatedMethodView):
         super(Archive, self).__init__(**kwargs)
 
     @staticmethod
-    def _to_json(ark):
-        """Return the archive as a JSON object.
-
-        Used to return JSON as an answer.
+    def _serialize(ark):
+        """Return the archive as a dictionary.
 
         :param ark: the archive
         :type ark: :py:class:`invenio_archivematica.models.Archive`
         """
-        return jsonify({
+        return {
             'sip_id': ark.sip_id,
             'status': ark.status.value,
             'accession_id': ark.accession_id,
             'archivematica_id': ark.archivematica_id
-        })
+        }
+
+    @classmethod
+    def _to_json(cls, ark):
+        """Return the archive as a JSON object.
+
+        Used to return JSON as an answer.
+
+        :param ark: the archive
+        :type ark: :py:class:`invenio_archivematica.models.Archive`
+        """
+        return jsonify(cls._serialize(ark))
 
     @require_api_auth()
     @require_oauth_scopes(archive_scope.id)
@@ -122,15 +173,27 @@ class Archive(ContentNegotiatedMethodView):
 
         The accesion_id is used to change the object. You can only change
         the status or the archivematica_id.
+
+        The new status is saved, and the rest of the change (such as the
+        signals, or the transfer) is done in background, see
+        :py:func:`invenio_archivematica.api.change_status_async`. Repeating
+        the same change does nothing, so Archivematica can safely retry it.
+
+        :return: ``202`` with the accepted archive if a change has been
+            enqueued, else ``200`` with the archive.
         """
-        if archivematica_id and archivematica_id != archive.archivematica_id:
-            archive.archivematica_id = archivematica_id
-        db.session.commit()
-        ark_status = status_converter(status)
-        if ark_status and ark_status != archive.status:
-            change_status_func[ark_status](archive.sip, archive.accession_id,
-                                           archive.archivematica_id)
-        return self._to_json(archive)
+        ark_status = status and status_converter(status)
+        if not ark_status:
+            if archivematica_id \
+                    and archivematica_id != str(archive.archivematica_id):
+                archive.archivematica_id = archivematica_id
+                db.session.commit()
+            return self._to_json(archive)
+        accepted = change_status_async(archive, ark_status, archivematica_id)
+        res = self._to_json(archive)
+        if accepted:
+            res.status_code = 202
+        return res
 
     @require_api_auth()
     @require_oauth_scopes(archive_scope.id)
@@ -160,84 +223,500 @@ class Archive(ContentNegotiatedMethodView):
                 or not archive.archivematica_id:
             return self._to_json(archive)
         # we ask Archivematica
-        # first we look at the status of the transfer
-        if archive.status in (ArchiveStatus.WAITING,
-                              ArchiveStatus.PROCESSING_TRANSFER):
-            url = '{base}/api/transfer/status/{uuid}/'.format(
-                base=current_app.config['ARCHIVEMATICA_DASHBOARD_URL'],
-                uuid=archive.archivematica_id)
-            params = {
-                'username': current_app.config['ARCHIVEMATICA_DASHBOARD_USER'],
-                'api_key':
-                    current_app.config['ARCHIVEMATICA_DASHBOARD_API_KEY']
-            }
-            response = requests.get(url, params=params)
-            if not response.ok:  # a problem occured
-                return jsonify({}), response.status_code
-            status = status_converter(response.json()['status'])
-            # if status is not complete, we stop here
-            if status != ArchiveStatus.REGISTERED:
-                if status != archive.status:
-                    change_status_func[status](archive.sip,
-                                               archive.accession_id,
-                                               archive.archivematica_id)
-                return self._to_json(archive)
-            # transfer finished, we need to update the archive
-            status = ArchiveStatus.PROCESSING_AIP
-            archive.archivematica_id = response.json()['sip_uuid']
-            change_status_func[status](archive.sip, archive.accession_id,
-                                       archive.archivematica_id)
-        # we try to get the status of the SIP
-        url = '{base}/api/ingest/status/{uuid}/'.format(
-            base=current_app.config['ARCHIVEMATICA_DASHBOARD_URL'],
-            uuid=archive.archivematica_id)
-        response = requests.get(url, params=params)
-        if not response.ok:  # a problem occured
-            return jsonify({}), response.status_code
-        status = status_converter(response.json()['status'],
-                                  aip_processing=True)
-        if status != archive.status:
-            change_status_func[status](archive.sip, archive.accession_id,
-                                       archive.archivematica_id)
+        try:
+            status, archivematica_id = current_archivematica.get_real_status(
+                archive.status, archive.archivematica_id)
+        except HTTPError as e:  # a problem occured
+            return jsonify({}), e.response.status_code
+        except RequestException:  # Archivematica can't be reached
+            return jsonify({}), 520
+        if status != archive.status \
+                or archivematica_id != str(archive.archivematica_id):
+            func = change_status_func[status]
+            if func:
+                func(archive.sip, archive.accession_id, archivematica_id)
         return self._to_json(archive)
 
 
+class ArchiveList(ContentNegotiatedMethodView):
+    """List of the archives."""
+
+    def __init__(self, **kwargs):
+        """Constructor."""
+        kwargs['method_serializers'] = {
+            'GET': {'application/json': make_response}
+        }
+        kwargs['default_method_media_type'] = {'GET': 'application/json'}
+        kwargs['default_media_type'] = 'application/json'
+        super(ArchiveList, self).__init__(**kwargs)
+
+    @require_api_auth()
+    @require_oauth_scopes(archive_scope.id)
+    @use_kwargs({
+        'status': fields.List(
+            fields.Str(validate=lambda s: s in ArchiveStatus.__members__),
+            required=False,
+            location='query'
+        ),
+        'sip_id': fields.UUID(required=False, location='query'),
+        'created_after': fields.DateTime(required=False, location='query'),
+        'created_before': fields.DateTime(required=False, location='query'),
+        'updated_after': fields.DateTime(required=False, location='query'),
+        'updated_before': fields.DateTime(required=False, location='query'),
+        'after': fields.Int(required=False, missing=None, location='query'),
+        'size': fields.Int(required=False, location='query',
+                           validate=lambda size: size > 0),
+    })
+    def get(self, status=None, sip_id=None, created_after=None,
+            created_before=None, updated_after=None, updated_before=None,
+            after=None, size=None):
+        """Return a page of the archives, ordered by their ID.
+
+        The pages use a cursor: ``links.next`` gives the URL of the next page,
+        whose archives have an ID greater than ``after``. Getting a page has
+        the same cost wherever it is in the table.
+
+        :param list status: only return the archives with one of these
+            status, such as ``REGISTERED``
+        :param str sip_id: only return the archive of this sip
+        :param created_after: only return the archives created since then
+        :param created_before: only return the archives created before then
+        :param updated_after: only return the archives updated since then
+        :param updated_before: only return the archives updated before then
+        :param int after: the cursor, only return the archives with a
+            greater ID
+        :param int size: the number of archives in the page
+        :return: a JSON object with the ``hits`` and the ``links``.
+        :rtype: str
+        """
+        with Permission(_action2need_map['archive-read'](None)).require(
+                http_exception=403):
+            max_size = current_app.config['ARCHIVEMATICA_LIST_MAX_SIZE']
+            size = min(size or current_app.config['ARCHIVEMATICA_LIST_SIZE'],
+                       max_size)
+            query = db.session.query(
+                Archive_.id, Archive_.sip_id, Archive_.status,
+                Archive_.accession_id, Archive_.archivematica_id)
+            if status:
+                query = query.filter(Archive_.status.in_(
+                    [ArchiveStatus[s] for s in status]))
+            if sip_id:
+                query = query.filter(Archive_.sip_id == sip_id)
+            if created_after:
+                query = query.filter(Archive_.created >= to_utc(created_after))
+            if created_before:
+                query = query.filter(Archive_.created < to_utc(created_before))
+            if updated_after:
+                query = query.filter(Archive_.updated >= to_utc(updated_after))
+            if updated_before:
+                query = query.filter(Archive_.updated < to_utc(updated_before))
+            if after is not None:
+                query = query.filter(Archive_.id > after)
+            # one more row tells if there is a next page
+            rows = query.order_by(Archive_.id).limit(size + 1).all()
+            links = {}
+            if len(rows) > size:
+                rows = rows[:size]
+                args = request.args.to_dict(flat=False)
+                args.pop('after', None)
+                # the credentials are not part of the link
+                args.pop('access_token', None)
+                links['next'] = url_for(
+                    'invenio_archivematica_api.archive_list_api',
+                    after=rows[-1].id, _external=True, **args)
+            return jsonify({
+                'hits': [Archive._serialize(row) for row in rows],
+                'links': links
+            })
+
+
+class ArchivesStatus(ContentNegotiatedMethodView):
+    """Status of the archival of many records at once."""
+
+    def __init__(self, **kwargs):
+        """Constructor."""
+        kwargs['method_serializers'] = {
+            'POST': {'application/json': make_response}
+        }
+        kwargs['default_method_media_type'] = {'POST': 'application/json'}
+        kwargs['default_media_type'] = 'application/json'
+        super(ArchivesStatus, self).__init__(**kwargs)
+
+    @require_api_auth()
+    @require_oauth_scopes(archive_scope.id)
+    @use_kwargs({
+        'accession_ids': fields.List(
+            fields.Str(),
+            load_from='accession_ids',
+            required=False,
+            missing=None,
+            location='json'
+        ),
+        'sip_ids': fields.List(
+            fields.UUID(),
+            load_from='sip_ids',
+            required=False,
+            missing=None,
+            location='json'
+        ),
+        'real_status': fields.Boolean(
+            load_from='realStatus',
+            required=False,
+            location='json'
+        )
+    })
+    def post(self, accession_ids=None, sip_ids=None, real_status=False):
+        """Return the status of many Archive objects.
+
+        The archives are given either by their accession ID or by the ID of
+        their sip, and are returned in a map using the same keys. The keys
+        that are unknown or that the user cannot read are returned in
+        ``errors`` with the corresponding HTTP status code.
+
+        :param list accession_ids: the accession ID of the archives
+        :param list sip_ids: the ID of the sips
+        :param bool real_status: If real_status is True, ask Archivematica to
+            get the current status of the archives, see
+            :py:meth:`invenio_archivematica.views.rest.Archive.get`. The
+            archives that Archivematica cannot answer for keep their status,
+            and the code of the error is returned in ``errors``.
+        :return: a JSON object with the ``archives`` and the ``errors``.
+        :rtype: str
+        """
+        if (accession_ids is None) == (sip_ids is None):
+            abort(400, 'Give either accession_ids or sip_ids.')
+        keys = sip_ids if accession_ids is None else accession_ids
+        max_size = current_app.config['ARCHIVEMATICA_STATUS_BATCH_SIZE']
+        if len(keys) > max_size:
+            abort(400, 'Cannot ask more than {} archives.'.format(max_size))
+        if accession_ids is not None:
+            column, key = Archive_.accession_id, lambda ark: ark.accession_id
+        else:
+            column, key = Archive_.sip_id, lambda ark: str(ark.sip_id)
+        archives = Archive_.query.filter(column.in_(keys)).all()
+        archives, forbidden = filter_permission(archives, 'archive-read')
+        errors = dict((str(k), 404) for k in keys)
+        errors.update((key(ark), 403) for ark in forbidden)
+        for ark in archives:
+            del errors[key(ark)]
+        results = dict((key(ark), Archive._serialize(ark))
+                       for ark in archives)
+        if real_status:
+            errors.update(self._update_real_status(archives, results, key))
+        return jsonify({'archives': results, 'errors': errors})
+
+    @staticmethod
+    def _update_real_status(archives, results, key):
+        """Ask Archivematica the status of the archives, and update them.
+
+        :param list archives: the archives
+        :param dict results: the serialized archives, updated in place
+        :param key: the function returning the key of an archive
+        :returns: the HTTP status code of the failed requests, by key
+        :rtype: dict
+        """
+        archives = [ark for ark in archives
+                    if ark.archivematica_id and ark.status not in (
+                        ArchiveStatus.FAILED, ArchiveStatus.NEW)]
+        if not archives:
+            return {}
+        app = current_app._get_current_object()
+
+        def fetch(item):
+            with app.app_context():
+                try:
+                    return current_archivematica.get_real_status(*item[1:])
+                except HTTPError as e:
+                    return e.response.status_code
+                except RequestException:
+                    return 520
+
+        workers = min(app.config['ARCHIVEMATICA_STATUS_BATCH_WORKERS'],
+                      len(archives))
+        todo = [(ark, ark.status, str(ark.archivematica_id))
+                for ark in archives]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            answers = list(executor.map(fetch, todo))
+        errors = {}
+        changes = defaultdict(dict)
+        for (ark, status, archivematica_id), answer in zip(todo, answers):
+            if not isinstance(answer, tuple):
+                errors[key(ark)] = answer
+                continue
+            new_status, new_id = answer
+            if new_status == status and new_id == archivematica_id:
+                continue
+            results[key(ark)].update(status=new_status.value,
+                                     archivematica_id=new_id)
+            changes[new_status][ark] = new_id
+        for status, arks in changes.items():
+            if status in change_status_bulk_func:
+                change_status_bulk_func[status](
+                    sip_ids=[ark.sip_id for ark in arks],
+                    archivematica_ids=dict((ark.sip_id, new_id)
+                                           for ark, new_id in arks.items()))
+            elif change_status_func[status]:
+                for ark, new_id in arks.items():
+                    change_status_func[status](ark.sip, ark.accession_id,
+                                               new_id)
+        return errors
+
+
+class ArchivematicaCallback(ContentNegotiatedMethodView):
+    """Notifications sent by Archivematica.
+
+    Archivematica pushes the changes of status to this endpoint, so the
+    archives do not need to be polled. The requests are authenticated with
+    the shared secret
+    :py:data:`invenio_archivematica.config.ARCHIVEMATICA_CALLBACK_SECRET`,
+    given in the ``X-Archivematica-Secret`` header. It is never read from
+    the URL, which ends up in the logs of the servers and proxies.
+
+    The body is a JSON object whose ``event`` is one of:
+
+    - ``post_store``: the AIP ``package_uuid`` has been stored. This is the
+      post-store callback of Archivematica Storage, whose body can be
+      ``{"event": "post_store", "package_uuid": "<package_uuid>"}``.
+    - ``transfer_completed``: the transfer ``transfer_uuid`` is complete,
+      and its AIP ``sip_uuid`` is being processed.
+    - ``transfer_failed`` or ``ingest_failed``: the transfer
+      ``transfer_uuid`` or the AIP ``sip_uuid`` has failed.
+
+    An ``accession_id`` can also be given, to find the archive when its ID
+    in Archivematica is not known yet.
+    """
+
+    events = {
+        'post_store': (ArchiveStatus.REGISTERED, 'package_uuid',
+                       'package_uuid'),
+        'transfer_completed': (ArchiveStatus.PROCESSING_AIP,
+                               'transfer_uuid', 'sip_uuid'),
+        'transfer_failed': (ArchiveStatus.FAILED, 'transfer_uuid', None),
+        'ingest_failed': (ArchiveStatus.FAILED, 'sip_uuid', None),
+    }
+    """New status, key of the current ID and key of the new ID by event."""
+
+    def __init__(self, **kwargs):
+        """Constructor."""
+        kwargs['method_serializers'] = {
+            'POST': {'application/json': make_response}
+        }
+        kwargs['default_method_media_type'] = {'POST': 'application/json'}
+        kwargs['default_media_type'] = 'application/json'
+        super(ArchivematicaCallback, self).__init__(**kwargs)
+
+    @staticmethod
+    def _check_secret():
+        """Abort if the request does not give the shared secret."""
+        secret = current_app.config['ARCHIVEMATICA_CALLBACK_SECRET']
+        if not secret:
+            abort(404)
+        given = request.headers.get('X-Archivematica-Secret', '')
+        if not hmac.compare_digest(given.encode('utf-8'),
+                                   secret.encode('utf-8')):
+            abort(403)
+
+    def post(self):
+        """Change the status of an archive, asynchronously.
+
+        The change is done by a task, see
+        :py:func:`invenio_archivematica.tasks.oais_change_status_bulk`.
+
+        :return: ``202`` with the archive and its new status, ``200`` if
+            the archive has already this status, or ``409`` if the archive
+            has already gone past this status (e.g. a late notification).
+        :rtype: str
+        """
+        self._check_secret()
+        payload = request.get_json(silent=True) or {}
+        if payload.get('event') not in self.events:
+            abort(400, 'Unknown event.')
+        status, current_key, new_key = self.events[payload['event']]
+        for key in (current_key, new_key):
+            if key and payload.get(key):
+                try:
+                    payload[key] = str(uuid.UUID(str(payload[key])))
+                except ValueError:
+                    abort(400, 'Invalid {}.'.format(key))
+        if not payload.get(current_key) and not payload.get('accession_id'):
+            abort(400, 'Missing {} or accession_id.'.format(current_key))
+        archive = None
+        if payload.get(current_key):
+            archive = Archive_.query.filter_by(
+                archivematica_id=payload[current_key]).one_or_none()
+        if archive is None and payload.get('accession_id'):
+            archive = Archive_.get_from_accession_id(payload['accession_id'])
+        if archive is None:
+            abort(404, 'Archive not found.')
+        current_id = archive.archivematica_id and \
+            str(archive.archivematica_id)
+        archivematica_id = (new_key and payload.get(new_key)) or current_id
+        result = Archive._serialize(archive)
+        result.update(status=status.value, archivematica_id=archivematica_id)
+        if archive.status == status and current_id == archivematica_id:
+            return jsonify(result)
+        if not is_forward_status(archive.status, status):
+            abort(409, 'The archive is already {}.'.format(
+                archive.status.value))
+        sip_id = str(archive.sip_id)
+        oais_change_status_bulk.delay(
+            [sip_id], str(status),
+            {sip_id: archivematica_id} if archivematica_id else {},
+            only_changed=True)
+        return jsonify(result), 202
+
+
 class ArchiveDownload(ContentNegotiatedMethodView):
     """Stream file from Archivematica."""
 
+    @staticmethod
+    def _offload(mode, uuid):
+        """Let the front-end server send the AIP.
+
+        :param str mode: ``x-accel-redirect`` or ``x-sendfile``
+        :param str uuid: the ID of the AIP in Archivematica
+        :returns: the response, or None if the AIP cannot be offloaded
+        """
+        client = current_archivematica.client
+        if mode == 'x-accel-redirect':
+            location = current_app.config[
+                'ARCHIVEMATICA_DOWNLOAD_OFFLOAD_LOCATION']
+            header = ('X-Accel-Redirect',
+                      location.rstrip('/') + client.download_path(uuid))
+        elif mode == 'x-sendfile':
+            path = client.get_file(uuid).get('current_full_path')
+            # uncompressed AIPs are directories, streamed as tarballs
+            if not path or not os.path.isfile(path):
+                return None
+            header = ('X-Sendfile', path)
+        else:
+            raise ValueError('Unknown offload mode: {}'.format(mode))
+        response = Response(content_type='application/octet-stream')
+        response.headers[header[0]] = header[1]
+        return response
+
+    @staticmethod
+    def _verify(uuid, chunks):
+        """Verify the checksum of an AIP while it is streamed.
+
+        See :py:func:`invenio_archivematica.fixity.verify_chunks`.
+
+        :param str uuid: the ID of the AIP in Archivematica
+        :param chunks: the iterator over the content of the AIP
+        :returns: the iterator over the content of the AIP
+        """
+        app = current_app._get_current_object()
+        try:
+            checksum = current_archivematica.client.get_checksum(uuid)
+        except RequestException as e:
+            checksum = None
+            app.logger.warning('AIP %s: cannot get its checksum: %s', uuid, e)
+        if not checksum:
+            app.logger.info('AIP %s: no checksum to verify', uuid)
+            return chunks
+        algorithm, expected = checksum
+        algorithm = algorithm or app.config[
+            'ARCHIVEMATICA_DOWNLOAD_FIXITY_ALGORITHM']
+        if algorithm not in hashlib.algorithms_available:
+            app.logger.warning('AIP %s: unknown checksum algorithm %s',
+                               uuid, algorithm)
+            return chunks
+
+        def callback(uuid, expected, computed):
+            if computed == expected.lower():
+                app.logger.info('AIP %s: checksum verified', uuid)
+            else:
+                app.logger.error('AIP %s: checksum %s instead of %s',
+                                 uuid, computed, expected)
+            oais_download_verified.send(str(uuid), expected=expected,
+                                        computed=computed)
+
+        return verify_chunks(
+            chunks, str(uuid), algorithm, expected, callback=callback,
+            fatal=app.config['ARCHIVEMATICA_DOWNLOAD_FIXITY_FATAL'])
+
     @require_api_auth()
     @require_oauth_scopes(archive_scope.id)
     @pass_accession_id
-#    @check_permission('archive-read')
+    @check_permission('archive-read')
     def get(self, archive):
         """Send the archive object as a file to the client.
 
+        The ``Range`` and ``If-Range`` headers of the request are forwarded
+        to Archivematica Storage, so an interrupted download can be resumed:
+        the answer is then a ``206 Partial Content`` with the
+        ``Content-Range`` given by Archivematica.
+
+        If ``ARCHIVEMATICA_DOWNLOAD_OFFLOAD`` is set, only the permissions
+        are checked here, and the AIP is sent by the front-end server.
+
+        If the local cache of the AIPs is enabled, the AIP is served from it
+        when possible, and the complete downloads are stored in it. See
+        :py:class:`invenio_archivematica.aipcache.AIPCache`.
+
         :return: a file taken from archivematica.
         """
         if not archive.status == ArchiveStatus.REGISTERED \
                 or not archive.archivematica_id:
             return make_response('Archive has not been registered yet.', 412)
+        aip_cache = current_archivematica.aip_cache
+        if aip_cache:
+            path = aip_cache.get(archive.archivematica_id)
+            if path:
+                try:
+                    return send_file(path,
+                                     mimetype='application/octet-stream',
+                                     conditional=True)
+                except (IOError, OSError):  # evicted in the meantime
+                    pass
+        offload = current_app.config['ARCHIVEMATICA_DOWNLOAD_OFFLOAD']
+        if offload:
+            try:
+                response = self._offload(offload, archive.archivematica_id)
+            except HTTPError as e:
+                return make_response('', e.response.status_code)
+            except ConnectionError:
+                return make_response(
+                    'Connection problem with Archivematica', 520)
+            if response is not None:
+                return response
         try:
-            url = '{base}/api/v2/file/{uuid}/download/'.format(
-                base=current_app.config['ARCHIVEMATICA_STORAGE_URL'],
-                uuid=archive.archivematica_id)
-            params = {
-                'username': current_app.config[
-                    'ARCHIVEMATICA_STORAGE_USER'],
-                'api_key': current_app.config[
-                    'ARCHIVEMATICA_STORAGE_API_KEY']
-            }
-            response = requests.get(url, params=params, stream=True)
+            response = current_archivematica.client.download(
+                archive.archivematica_id,
+                headers=dict((key, request.headers[key])
+                             for key in ('Range', 'If-Range')
+                             if key in request.headers))
             if response.ok:
                 headers = Headers()
                 for key, value in response.headers.items():
-                    headers.add(key, value)
-                return Response(stream_with_context(
-                    response.iter_content(chunk_size=10*1024)),
-                    content_type='application/octet-stream',
-                    headers=headers)
+                    # the WSGI server handles the connection itself
+                    if not is_hop_by_hop_header(key) \
+                            and key.lower() != 'content-type':
+                        headers.add(key, value)
+                chunk_size = current_app.config[
+                    'ARCHIVEMATICA_DOWNLOAD_CHUNK_SIZE']
+                chunks = response.iter_content(chunk_size=chunk_size)
+                if response.status_code == 200 and current_app.config[
+                        'ARCHIVEMATICA_DOWNLOAD_FIXITY']:
+                    chunks = self._verify(archive.archivematica_id, chunks)
+                if aip_cache and response.status_code == 200:
+                    size = response.headers.get('Content-Length')
+                    chunks = aip_cache.tee(archive.archivematica_id, chunks,
+                                           size and int(size))
+                res = Response(stream_with_context(chunks),
+                               status=response.status_code,
+                               content_type='application/octet-stream',
+                               headers=headers,
+                               direct_passthrough=True)
+                res.call_on_close(response.close)
+                return res
             # problem
-            return make_response('', response.status_code)
+            headers = {}
+            if 'Content-Range' in response.headers:
+                # the range is not satisfiable, we give the size of the file
+                headers['Content-Range'] = response.headers['Content-Range']
+            response.close()
+            return make_response('', response.status_code, headers)
         except ConnectionError as e:
             return make_response('Connection problem with Archivematica', 520)
 
@@ -247,6 +726,23 @@ blueprint.add_url_rule(
     view_func=Archive.as_view('archive_api')
 )
 
+blueprint.add_url_rule(
+    '/archives/',
+    view_func=ArchiveList.as_view('archive_list_api')
+)
+
+blueprint.add_url_rule(
+    '/archives/status',
+    view_func=ArchivesStatus.as_view('archives_status_api'),
+    methods=['POST']
+)
+
+blueprint.add_url_rule(
+    '/callback/',
+    view_func=ArchivematicaCallback.as_view('callback_api'),
+    methods=['POST']
+)
+
 blueprint.add_url_rule(
     '/archive/<string:accession_id>/download/',
     view_func=ArchiveDownload.as_view('download_api')
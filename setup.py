@@ -20,19 +20,27 @@ tests_require = [
     'coverage>=4.0',
     'invenio-accounts>=1.0.0',
     'isort>=4.3',
+    'mock>=2.0.0',
     'pydocstyle>=1.0.0',
     'pytest-cov>=1.8.0',
     'pytest-pep8>=1.0.6',
     'pytest>=2.8.3',
+    'zstandard>=0.11.0',
 ]
 
 extras_require = {
+    'cache': [
+        'invenio-cache>=1.0.0',
+    ],
     'docs': [
         # TODO unpin see
         # https://github.com/inveniosoftware/troubleshooting/issues/11
         'Sphinx>=1.5.1,<1.6',
     ],
     'tests': tests_require,
+    'zstd': [
+        'zstandard>=0.11.0',
+    ],
 }
 
 extras_require['all'] = []
@@ -48,6 +56,7 @@ install_requires = [
     'Flask-BabelEx>=0.9.3',
     'Flask-CeleryExt>=0.3.0',
     'alembic>=0.9.3',
+    'futures>=3.1.1;python_version=="2.7"',
     'invenio-admin>=1.0.0',
     'invenio-access>=1.0.1',
     'invenio-db>=1.0.0',
@@ -55,6 +64,8 @@ install_requires = [
     'invenio-oauth2server>=1.0.3',
     'invenio-rest[cors]>=1.0.0',
     'invenio-sipstore>=1.0.0a7',
+    'requests>=2.18.0',
+    'six>=1.12.0',
     'webargs==4.4.1',   # TODO to be removed, see https://github.com/inveniosoftware/invenio-files-rest/pull/185#issue-246063980
 ]
 
@@ -112,6 +123,9 @@ setup(
         'invenio_celery.tasks': [
             'invenio_archivematica = invenio_archivematica.tasks'
         ],
+        'invenio_db.alembic': [
+            'invenio_archivematica = invenio_archivematica:alembic',
+        ],
         # 'invenio_db.models': [],
         # 'invenio_pidstore.minters': [],
         # 'invenio_records.jsonresolver': [],
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2017-2019 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Test the local cache of the AIPs."""
+
+import os
+import time
+
+from invenio_archivematica.aipcache import AIPCache
+
+
+def test_tee(tmpdir):
+    """Test that a complete download is stored."""
+    cache = AIPCache(str(tmpdir.join('aips')), 100)
+    assert cache.get('a') is None
+    chunks = list(cache.tee('a', iter([b'abc', b'def']), size=6))
+    assert chunks == [b'abc', b'def']
+    path = cache.get('a')
+    with open(path, 'rb') as f:
+        assert f.read() == b'abcdef'
+    assert os.listdir(cache.directory) == ['a']
+
+
+def test_tee_incomplete(tmpdir):
+    """Test that incomplete downloads are not stored."""
+    cache = AIPCache(str(tmpdir), 100)
+    # wrong size
+    list(cache.tee('a', iter([b'abc']), size=6))
+    assert cache.get('a') is None
+    # interrupted download
+    chunks = cache.tee('b', iter([b'abc', b'def']))
+    next(chunks)
+    chunks.close()
+    assert cache.get('b') is None
+    assert os.listdir(cache.directory) == []
+    # too big for the cache
+    list(cache.tee('c', iter([b'abc']), size=1000))
+    assert cache.get('c') is None
+
+
+def test_evict(tmpdir):
+    """Test that the least recently used AIPs are removed."""
+    cache = AIPCache(str(tmpdir), 10)
+    for name in 'abc':
+        list(cache.tee(name, iter([b'1234'])))
+        # the modification times must differ
+        time.sleep(0.01)
+        if name == 'b':
+            cache.get('a')
+    assert sorted(os.listdir(cache.directory)) == ['a', 'c']
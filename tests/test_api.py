@@ -8,4 +8,98 @@
 
 """Test the API."""
 
+import uuid
+
+import pytest
+from invenio_sipstore.models import SIP
+from mock import patch
+
 from invenio_archivematica import api
+from invenio_archivematica.models import Archive, ArchiveStatus
+from invenio_archivematica.signals import oais_transfer_finished
+from invenio_archivematica.tasks import oais_notify_status, oais_start_transfer
+
+
+def test_change_status_bulk(db):
+    """Test the functions changing the status of many sips."""
+    sips = [SIP.create() for i in range(3)]
+    for i, sip in enumerate(sips):
+        Archive.create(sip, accession_id='id{}'.format(i))
+    db.session.commit()
+    aipid = uuid.uuid4()
+    received = []
+
+    def receiver(sender, *args, **kwargs):
+        received.append(sender.id)
+
+    # a sip without archive is not changed
+    other = SIP.create()
+    db.session.commit()
+
+    oais_transfer_finished.connect(receiver)
+    try:
+        api.finish_transfers(sip_ids=[sips[0].id, sips[1].id, other.id],
+                             archivematica_ids={sips[0].id: aipid})
+    finally:
+        oais_transfer_finished.disconnect(receiver)
+    assert sorted(received) == sorted([sips[0].id, sips[1].id])
+    assert not SIP.query.get(other.id).archived
+    ark = Archive.get_from_sip(sips[0].id)
+    assert ark.status == ArchiveStatus.REGISTERED
+    assert ark.archivematica_id == aipid
+    assert ark.sip.archived is True
+    ark = Archive.get_from_sip(sips[1].id)
+    assert ark.status == ArchiveStatus.REGISTERED
+    assert ark.archivematica_id is None
+    assert Archive.get_from_sip(sips[2].id).status == ArchiveStatus.NEW
+    # by accession ID
+    api.fail_transfers(accession_ids=['id1', 'id2', 'unknown'])
+    for sip in sips[1:]:
+        ark = Archive.get_from_sip(sip.id)
+        assert ark.status == ArchiveStatus.FAILED
+        assert ark.sip.archived is False
+    assert Archive.get_from_sip(sips[0].id).status == \
+        ArchiveStatus.REGISTERED
+    # the sips are given in one way only
+    with pytest.raises(ValueError):
+        api.fail_transfers(sip_ids=[sips[0].id], accession_ids=['id0'])
+
+
+def test_change_status_async(db):
+    """Test that a new status is saved and the rest is enqueued once."""
+    sip = SIP.create()
+    ark = Archive.create(sip, accession_id='id')
+    db.session.commit()
+    aipid = str(uuid.uuid4())
+    # the notification is enqueued once the status is committed
+    calls = []
+    commit = db.session.commit
+    with patch.object(db.session, 'commit',
+                      side_effect=lambda: calls.append('commit') or commit()):
+        with patch.object(oais_notify_status, 'delay',
+                          side_effect=lambda *args: calls.append('notify')
+                          ) as notify:
+            assert api.change_status_async(ark, ArchiveStatus.REGISTERED,
+                                           aipid)
+    assert calls == ['commit', 'notify']
+    notify.assert_called_once_with([str(sip.id)], 'REGISTERED')
+    with patch.object(oais_notify_status, 'delay') as notify:
+        ark = Archive.get_from_sip(sip.id)
+        assert ark.status == ArchiveStatus.REGISTERED
+        assert str(ark.archivematica_id) == aipid
+        # the same change is done only once
+        assert not api.change_status_async(ark, ArchiveStatus.REGISTERED,
+                                           aipid)
+        assert not api.change_status_async(ark, ArchiveStatus.REGISTERED)
+        assert not notify.called
+    with patch.object(oais_start_transfer, 'delay') as start:
+        assert api.change_status_async(ark, ArchiveStatus.NEW)
+        assert Archive.get_from_sip(sip.id).status == ArchiveStatus.QUEUED
+        assert not api.change_status_async(ark, ArchiveStatus.WAITING)
+        assert start.call_count == 1
+    # the new ID in Archivematica is saved with the other statuses too
+    newid = str(uuid.uuid4())
+    assert api.change_status_async(ark, ArchiveStatus.DELETED, newid)
+    ark = Archive.get_from_sip(sip.id)
+    assert ark.status == ArchiveStatus.DELETED
+    assert str(ark.archivematica_id) == newid
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2017-2019 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Test the caches of the status of the archives."""
+
+import threading
+import time
+import uuid
+
+import pytest
+from mock import patch
+from requests.exceptions import HTTPError
+
+from invenio_archivematica.cache import MemoryStatusCache, StatusCache
+from invenio_archivematica.client import ArchivematicaClient
+from invenio_archivematica.models import ArchiveStatus
+from invenio_archivematica.proxies import current_archivematica
+
+
+def test_memory_cache_ttl():
+    """Test that the values expire."""
+    cache = MemoryStatusCache(ttl=0.05)
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    time.sleep(0.1)
+    assert cache.get('a') is None
+
+
+def test_memory_cache_lru():
+    """Test that the least recently used values are evicted."""
+    cache = MemoryStatusCache(ttl=60, max_size=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+
+
+def test_get_or_fetch_coalescing():
+    """Test that concurrent calls for the same key fetch it once."""
+    cache = MemoryStatusCache(ttl=60)
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return 'value'
+
+    results = []
+
+    def worker():
+        results.append(cache.get_or_fetch('a', fetch))
+
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    threads[0].start()
+    started.wait()
+    for t in threads[1:]:
+        t.start()
+    time.sleep(0.05)
+    release.set()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert results == ['value'] * 5
+
+
+def test_get_or_fetch_error():
+    """Test that the errors are raised and not cached."""
+    cache = MemoryStatusCache(ttl=60)
+
+    def fetch():
+        raise HTTPError('boom')
+
+    with pytest.raises(HTTPError):
+        cache.get_or_fetch('a', fetch)
+    assert cache.get_or_fetch('a', lambda: 'value') == 'value'
+
+
+def test_ext_get_real_status(app):
+    """Test that the extension caches the real status."""
+    aipid = str(uuid.uuid4())
+    ret = (ArchiveStatus.PROCESSING_AIP, aipid)
+    with patch.object(ArchivematicaClient, 'get_real_status',
+                      return_value=ret) as mock:
+        for i in range(3):
+            assert current_archivematica.get_real_status(
+                ArchiveStatus.PROCESSING_AIP, aipid) == ret
+    assert mock.call_count == 1
+
+
+def test_ext_get_real_status_forward(app):
+    """Test that a cached status never moves an archive backwards."""
+    aipid = str(uuid.uuid4())
+    ret = (ArchiveStatus.PROCESSING_TRANSFER, aipid)
+    with patch.object(ArchivematicaClient, 'get_real_status',
+                      return_value=ret) as mock:
+        assert current_archivematica.get_real_status(
+            ArchiveStatus.WAITING, aipid) == ret
+        # the archive moved on in the meantime, the status is asked again
+        assert current_archivematica.get_real_status(
+            ArchiveStatus.PROCESSING_AIP, aipid) == \
+            (ArchiveStatus.PROCESSING_AIP, aipid)
+    assert mock.call_count == 2
+
+
+def test_status_cache_abstract():
+    """Test that a cache must implement get and set."""
+    class Cache(StatusCache):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        Cache(ttl=60)
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2017-2019 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Test the requests to Archivematica."""
+
+import json
+import uuid
+
+import pytest
+from mock import patch
+from requests import Response
+from requests.exceptions import HTTPError
+
+from invenio_archivematica.models import ArchiveStatus
+from invenio_archivematica.proxies import current_archivematica
+
+
+def make_response(status_code=200, **content):
+    """Build a response of Archivematica."""
+    response = Response()
+    response.status_code = status_code
+    response._content = json.dumps(content).encode('utf-8')
+    return response
+
+
+POINTER_FILE = """<?xml version="1.0" encoding="UTF-8"?>
+<mets:mets xmlns:mets="http://www.loc.gov/METS/"
+           xmlns:premis="http://www.loc.gov/premis/v3">
+  <mets:amdSec><mets:techMD><mets:mdWrap MDTYPE="PREMIS:OBJECT">
+    <mets:xmlData><premis:object><premis:objectCharacteristics>
+      <premis:fixity>
+        <premis:messageDigestAlgorithm>SHA-256</premis:messageDigestAlgorithm>
+        <premis:messageDigest>abcdef</premis:messageDigest>
+      </premis:fixity>
+    </premis:objectCharacteristics></premis:object></mets:xmlData>
+  </mets:mdWrap></mets:techMD></mets:amdSec>
+</mets:mets>
+"""
+
+
+def test_client_config(app):
+    """Test the client built from the configuration."""
+    client = current_archivematica.client
+    assert client.dashboard_url == app.config['ARCHIVEMATICA_DASHBOARD_URL']
+    assert client.storage_url == app.config['ARCHIVEMATICA_STORAGE_URL']
+    assert client.timeout == (app.config['ARCHIVEMATICA_HTTP_CONNECT_TIMEOUT'],
+                              app.config['ARCHIVEMATICA_HTTP_READ_TIMEOUT'])
+    adapter = client.session.get_adapter(client.dashboard_url)
+    retries = app.config['ARCHIVEMATICA_HTTP_RETRIES']
+    assert adapter.max_retries.total == retries
+
+
+def test_client_session(app):
+    """Test that the session is reused, but not after a fork."""
+    client = current_archivematica.client
+    session = client.session
+    assert client.session is session
+    with patch('os.getpid', return_value=-1):
+        assert client.session is not session
+
+
+def test_get_real_status_transfer(app):
+    """Test get_real_status while the transfer is processing."""
+    client = current_archivematica.client
+    aipid = str(uuid.uuid4())
+    with patch('requests.Session.get',
+               return_value=make_response(status='PROCESSING')) as mock:
+        assert client.get_real_status(ArchiveStatus.WAITING, aipid) == \
+            (ArchiveStatus.PROCESSING_TRANSFER, aipid)
+    assert mock.call_count == 1
+    assert '/api/transfer/status/{}/'.format(aipid) in mock.call_args[0][0]
+    assert mock.call_args[1]['timeout'] == client.timeout
+
+
+def test_get_real_status_ingest(app):
+    """Test get_real_status once the transfer is complete."""
+    client = current_archivematica.client
+    aipid = str(uuid.uuid4())
+    sipid = str(uuid.uuid4())
+    responses = [make_response(status='COMPLETE', sip_uuid=sipid),
+                 make_response(status='PROCESSING')]
+    with patch('requests.Session.get', side_effect=responses) as mock:
+        assert client.get_real_status(
+            ArchiveStatus.PROCESSING_TRANSFER, aipid) == \
+            (ArchiveStatus.PROCESSING_AIP, sipid)
+    assert '/api/ingest/status/{}/'.format(sipid) in mock.call_args[0][0]
+
+
+def test_get_real_status_error(app):
+    """Test get_real_status when Archivematica answers with an error."""
+    client = current_archivematica.client
+    with patch('requests.Session.get', return_value=make_response(404)):
+        with pytest.raises(HTTPError):
+            client.get_real_status(ArchiveStatus.PROCESSING_AIP, uuid.uuid4())
+
+
+def test_get_checksum(app):
+    """Test get_checksum reading the pointer file of an AIP."""
+    client = current_archivematica.client
+    aipid = str(uuid.uuid4())
+    response = Response()
+    response.status_code = 200
+    response._content = POINTER_FILE.encode('utf-8')
+    with patch('requests.Session.get', return_value=response) as mock:
+        assert client.get_checksum(aipid) == ('sha256', 'abcdef')
+    assert '/api/v2/file/{}/pointer_file/'.format(aipid) in \
+        mock.call_args[0][0]
+    # an uncompressed AIP has no pointer file
+    with patch('requests.Session.get', return_value=make_response(404)):
+        assert client.get_checksum(aipid) is None
@@ -9,15 +9,21 @@
 """Test the factories."""
 
 import json
+import os
+import tarfile
 from os import path
 
+import pytest
 from flask import current_app
 from invenio_files_rest.models import FileInstance
-from invenio_sipstore.models import SIP, SIPFile, SIPMetadata, SIPMetadataType
+from invenio_pidstore.models import PersistentIdentifier, PIDStatus
+from invenio_sipstore.models import SIP, RecordSIP, SIPFile, SIPMetadata, \
+    SIPMetadataType
+from invenio_sipstore.signals import sipstore_archiver_status
 from six import BytesIO
 
 from invenio_archivematica import factories
-from invenio_archivematica.models import Archive
+from invenio_archivematica.models import Archive, ArchiveStatus
 
 
 def test_create_accessioned_id(db):
@@ -87,6 +93,86 @@ def test_transfer_cp(app, db, location):
         assert json.loads(fp.read()) == mcontent
 
 
+def test_transfer_cp_parallel(app, db, location):
+    """Test factories.transfer_cp function with several workers."""
+    app.config['SIPSTORE_ARCHIVER_DIRECTORY_BUILDER'] = \
+        'helpers:archive_directory_builder'
+    app.config['SIPSTORE_ARCHIVER_METADATA_TYPES'] = ['test']
+    app.config['ARCHIVEMATICA_TRANSFER_WORKERS'] = 4
+    sip = SIP.create()
+    mtype = SIPMetadataType(title='Test', name='test', format='json')
+    db.session.add(mtype)
+    mcontent = {'title': 'title', 'author': 'me'}
+    db.session.add(SIPMetadata(sip=sip, type=mtype,
+                               content=json.dumps(mcontent)))
+    fcontents = {}
+    for i in range(10):
+        f = FileInstance.create()
+        fcontents['file{}.txt'.format(i)] = content = \
+            'file number {}\n'.format(i).encode('utf-8')
+        f.set_contents(BytesIO(content), default_location=location.uri)
+        db.session.add(SIPFile(sip=sip, file=f,
+                               filepath='file{}.txt'.format(i)))
+    db.session.commit()
+
+    statuses = []
+    with sipstore_archiver_status.connected_to(
+            lambda status: statuses.append(status)):
+        assert factories.transfer_cp(sip.id, None) == 0
+
+    folder = path.join(location.uri, 'test')
+    for filename, content in fcontents.items():
+        with open(path.join(folder, 'files', filename), 'rb') as fp:
+            assert fp.read() == content
+    with open(path.join(folder, 'metadata', 'test.json'), 'r') as fp:
+        assert json.loads(fp.read()) == mcontent
+    assert len(statuses) == 11
+    assert statuses[-1]['copied_files'] == 11
+    assert statuses[-1]['copied_size'] == statuses[-1]['total_size']
+
+
+def test_transfer_cp_limits(app, db, location):
+    """Test the limits of factories.transfer_cp function."""
+    app.config['SIPSTORE_ARCHIVER_DIRECTORY_BUILDER'] = \
+        'helpers:archive_directory_builder'
+    sip = SIP.create()
+    for i in range(2):
+        f = FileInstance.create()
+        f.set_contents(BytesIO(b'test'), default_location=location.uri)
+        db.session.add(SIPFile(sip=sip, file=f,
+                               filepath='file{}.txt'.format(i)))
+    db.session.commit()
+    folder = path.join(location.uri, 'test')
+
+    app.config['ARCHIVEMATICA_TRANSFER_MAX_FILES'] = 1
+    assert factories.transfer_cp(sip.id, None) == 1
+    assert not path.exists(folder)
+    app.config['ARCHIVEMATICA_TRANSFER_MAX_FILES'] = None
+    app.config['ARCHIVEMATICA_TRANSFER_MAX_SIZE'] = 7
+    assert factories.transfer_cp(sip.id, None) == 1
+    assert not path.exists(folder)
+    app.config['ARCHIVEMATICA_TRANSFER_MAX_SIZE'] = 8
+    assert factories.transfer_cp(sip.id, None) == 0
+    assert path.isfile(path.join(folder, 'files', 'file1.txt'))
+
+
+def test_transfer_cp_hardlink(app, db, location):
+    """Test factories.transfer_cp function linking the files."""
+    app.config['SIPSTORE_ARCHIVER_DIRECTORY_BUILDER'] = \
+        'helpers:archive_directory_builder'
+    app.config['ARCHIVEMATICA_TRANSFER_COPY_METHODS'] = ['hardlink']
+    sip = SIP.create()
+    f = FileInstance.create()
+    f.set_contents(BytesIO(b'test'), default_location=location.uri)
+    db.session.add(SIPFile(sip=sip, file=f, filepath='portal.txt'))
+    db.session.commit()
+
+    assert factories.transfer_cp(sip.id, None) == 0
+
+    copy = path.join(location.uri, 'test', 'files', 'portal.txt')
+    assert os.stat(copy).st_ino == os.stat(f.uri).st_ino
+
+
 def test_transfer_rsync(app, db, location):
     """Test factories.transfer_rsync function."""
     # config
@@ -131,3 +217,153 @@ def test_transfer_rsync(app, db, location):
         assert fp.read() == fcontent
     with open(path.join(folder, 'metadata', 'test.json'), 'r') as fp:
         assert json.loads(fp.read()) == mcontent
+
+
+def test_transfer_stream(app, db, location, tmpdir):
+    """Test factories.transfer_stream function."""
+    app.config['SIPSTORE_ARCHIVER_METADATA_TYPES'] = ['test']
+    sip = SIP.create()
+    mtype = SIPMetadataType(title='Test', name='test', format='json')
+    db.session.add(mtype)
+    mcontent = {'title': 'title', 'author': 'me'}
+    db.session.add(SIPMetadata(sip=sip, type=mtype,
+                               content=json.dumps(mcontent)))
+    f = FileInstance.create()
+    fcontent = b'weighted companion cube\n'
+    f.set_contents(BytesIO(fcontent), default_location=location.uri)
+    db.session.add(SIPFile(sip=sip, file=f, filepath='portal.txt'))
+    Archive.create(sip, accession_id='id')
+    db.session.commit()
+
+    assert factories.transfer_stream(
+        sip.id, {'destination': str(tmpdir), 'buffer_size': 4}) == 0
+
+    # nothing is written in the archiver location
+    assert not path.exists(path.join(location.uri, 'test'))
+    assert tmpdir.listdir() == [tmpdir.join('id')]
+    folder = str(tmpdir.join('id'))
+    with open(path.join(folder, 'files', 'portal.txt'), 'rb') as fp:
+        assert fp.read() == fcontent
+    with open(path.join(folder, 'metadata', 'test.json'), 'r') as fp:
+        assert json.loads(fp.read()) == mcontent
+
+
+def test_transfer_tar(app, db, location, tmpdir):
+    """Test factories.transfer_tar function."""
+    app.config['SIPSTORE_ARCHIVER_METADATA_TYPES'] = ['test']
+    sip = SIP.create()
+    mtype = SIPMetadataType(title='Test', name='test', format='json')
+    db.session.add(mtype)
+    mcontent = {'title': u'tîtle', 'author': 'me'}
+    db.session.add(SIPMetadata(sip=sip, type=mtype,
+                               content=json.dumps(mcontent)))
+    f = FileInstance.create()
+    fcontent = b'weighted companion cube\n'
+    f.set_contents(BytesIO(fcontent), default_location=location.uri)
+    db.session.add(SIPFile(sip=sip, file=f, filepath='portal.txt'))
+    Archive.create(sip, accession_id='id')
+    db.session.commit()
+
+    assert factories.transfer_tar(
+        sip.id, {'destination': str(tmpdir), 'compression': 'gz'}) == 0
+
+    assert tmpdir.listdir() == [tmpdir.join('id.tar.gz')]
+    with tarfile.open(str(tmpdir.join('id.tar.gz')), 'r:gz') as tar:
+        assert tar.getmember('id').isdir()
+        assert tar.extractfile('id/files/portal.txt').read() == fcontent
+        assert json.loads(tar.extractfile(
+            'id/metadata/test.json').read().decode('utf-8')) == mcontent
+
+
+def test_transfer_tar_zstd(app, db, location, tmpdir):
+    """Test factories.transfer_tar function with the zstd compression."""
+    zstandard = pytest.importorskip('zstandard')
+    sip = SIP.create()
+    f = FileInstance.create()
+    fcontent = b'weighted companion cube\n'
+    f.set_contents(BytesIO(fcontent), default_location=location.uri)
+    db.session.add(SIPFile(sip=sip, file=f, filepath='portal.txt'))
+    Archive.create(sip, accession_id='id')
+    db.session.commit()
+
+    assert factories.transfer_tar(
+        sip.id, {'destination': str(tmpdir), 'compression': 'zstd'}) == 0
+
+    assert tmpdir.listdir() == [tmpdir.join('id.tar.zst')]
+    with open(str(tmpdir.join('id.tar.zst')), 'rb') as fp:
+        reader = zstandard.ZstdDecompressor().stream_reader(fp)
+        with tarfile.open(fileobj=reader, mode='r|') as tar:
+            files = dict((member.name, tar.extractfile(member).read())
+                         for member in tar if member.isfile())
+    assert files == {'id/files/portal.txt': fcontent}
+
+
+def test_transfer_cp_delta(app, db, location):
+    """Test factories.transfer_cp function transferring only the delta."""
+    app.config['SIPSTORE_ARCHIVER_DIRECTORY_BUILDER'] = \
+        'helpers:archive_directory_builder'
+    app.config['ARCHIVEMATICA_TRANSFER_DELTA'] = True
+    pid = PersistentIdentifier.create('recid', '1',
+                                      status=PIDStatus.REGISTERED)
+
+    def create_sip(contents):
+        sip = SIP.create()
+        for filepath, content in contents.items():
+            f = FileInstance.create()
+            f.set_contents(BytesIO(content), default_location=location.uri)
+            db.session.add(SIPFile(sip=sip, file=f, filepath=filepath))
+        db.session.add(RecordSIP(sip=sip, pid=pid))
+        return sip
+    sip1 = create_sip({'a.txt': b'a', 'b.txt': b'b'})
+    ark1 = Archive.create(sip1, accession_id='id1')
+    ark1.status = ArchiveStatus.REGISTERED
+    sip2 = create_sip({'a.txt': b'a', 'b.txt': b'new b', 'c.txt': b'c'})
+    Archive.create(sip2, accession_id='id2')
+    db.session.commit()
+
+    assert Archive.get_previous_registered(sip2.id) == ark1
+    assert Archive.get_previous_registered(sip1.id) is None
+    assert factories.transfer_cp(sip2.id, None) == 0
+
+    folder = path.join(location.uri, 'test')
+    files = sorted(os.listdir(path.join(folder, 'files')))
+    assert len(files) == 2
+    assert files[0].endswith('b.txt') and files[1].endswith('c.txt')
+    with open(path.join(folder, 'delta.json')) as fp:
+        delta = json.load(fp)
+    assert delta['previous']['accession_id'] == 'id1'
+    assert delta['previous']['sip_id'] == str(sip1.id)
+    assert [fi['sipfilepath'] for fi in delta['unchanged']] == ['a.txt']
+    assert delta['unchanged'][0]['archive']['accession_id'] == 'id1'
+    assert Archive.get_from_sip(sip2.id).delta == delta
+
+
+def test_transfer_cp_delta_chain(app, db, location):
+    """Test that a delta gives the archive holding each unchanged file."""
+    app.config['ARCHIVEMATICA_TRANSFER_DELTA'] = True
+    pid = PersistentIdentifier.create('recid', '1',
+                                      status=PIDStatus.REGISTERED)
+
+    def archive_sip(accession_id, contents):
+        sip = SIP.create()
+        for filepath, content in contents.items():
+            f = FileInstance.create()
+            f.set_contents(BytesIO(content), default_location=location.uri)
+            db.session.add(SIPFile(sip=sip, file=f, filepath=filepath))
+        db.session.add(RecordSIP(sip=sip, pid=pid))
+        ark = Archive.create(sip, accession_id=accession_id)
+        db.session.commit()
+        assert factories.transfer_cp(sip.id, None) == 0
+        ark.status = ArchiveStatus.REGISTERED
+        db.session.commit()
+        return ark
+
+    archive_sip('id1', {'a.txt': b'a', 'b.txt': b'b'})
+    archive_sip('id2', {'a.txt': b'a', 'b.txt': b'new b'})
+    ark3 = archive_sip('id3', {'a.txt': b'a', 'b.txt': b'new b'})
+
+    assert ark3.delta['previous']['accession_id'] == 'id2'
+    holders = dict((fi['sipfilepath'], fi['archive']['accession_id'])
+                   for fi in ark3.delta['unchanged'])
+    # the content of a.txt is only in the first archive
+    assert holders == {'a.txt': 'id1', 'b.txt': 'id2'}
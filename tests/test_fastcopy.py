@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2017-2019 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Test the copy of local files."""
+
+import os
+
+import pytest
+
+from invenio_archivematica import fastcopy
+
+
+@pytest.mark.parametrize('methods', [
+    [], ['reflink'], ['hardlink'], ['copy_file_range'],
+    ['reflink', 'hardlink', 'copy_file_range'],
+])
+def test_copy_file(tmpdir, methods):
+    """Test the copy of a file with each method."""
+    src = tmpdir.join('src')
+    src.write_binary(b'weighted companion cube\n' * 1000)
+    dst = tmpdir.join('a', 'b', 'dst')
+    # a previous copy is replaced
+    dst.write_binary(b'old content', ensure=True)
+
+    method = fastcopy.copy_file(str(src), str(dst), methods, buffer_size=7)
+    assert method in methods + ['copy']
+    assert dst.read_binary() == src.read_binary()
+    if method == 'hardlink':
+        assert os.stat(str(dst)).st_ino == os.stat(str(src)).st_ino
+
+
+def test_copy_file_fallback(tmpdir, monkeypatch):
+    """Test the buffered copy when no method works."""
+    def fail(src, dst):
+        raise OSError()
+    monkeypatch.setitem(fastcopy.METHODS, 'hardlink', fail)
+    src = tmpdir.join('src')
+    src.write_binary(b'content')
+    dst = tmpdir.join('dst')
+    assert fastcopy.copy_file(str(src), str(dst), ['hardlink']) == 'copy'
+    assert dst.read_binary() == b'content'
+
+    with pytest.raises(IOError):
+        fastcopy.copy_file(str(tmpdir.join('missing')), str(dst), [])
+
+
+def test_copy_file_range_incomplete(tmpdir, monkeypatch):
+    """Test that an incomplete kernel copy falls back to the buffered one."""
+    monkeypatch.setattr(os, 'copy_file_range', lambda fdin, fdout, count: 0,
+                        raising=False)
+    src = tmpdir.join('src')
+    src.write_binary(b'content')
+    dst = tmpdir.join('dst')
+    with pytest.raises(OSError):
+        fastcopy.copy_file_range(str(src), str(dst))
+    assert fastcopy.copy_file(str(src), str(dst), ['copy_file_range']) == \
+        'copy'
+    assert dst.read_binary() == b'content'
+
+
+def test_copy_file_over_hardlink(tmpdir):
+    """Test that copying over a hard link leaves the linked file intact."""
+    src = tmpdir.join('src')
+    src.write_binary(b'content')
+    dst = tmpdir.join('dst')
+    assert fastcopy.copy_file(str(src), str(dst), ['hardlink']) == \
+        'hardlink'
+    other = tmpdir.join('other')
+    other.write_binary(b'other content')
+    fastcopy.copy_file(str(other), str(dst), ['reflink', 'copy_file_range'])
+    assert dst.read_binary() == b'other content'
+    assert src.read_binary() == b'content'
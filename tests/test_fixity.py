@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2017-2019 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Test the fixity of the AIPs."""
+
+import hashlib
+
+import pytest
+
+from invenio_archivematica.fixity import FixityError, verify_chunks
+
+
+def test_verify_chunks():
+    """Test that the checksum is computed while streaming."""
+    checksum = hashlib.sha256(b'abcdef').hexdigest()
+    results = []
+    chunks = verify_chunks(iter([b'abc', b'def']), 'aip', 'sha256',
+                           checksum.upper(),
+                           callback=lambda *args: results.append(args),
+                           fatal=True)
+    assert list(chunks) == [b'abc', b'def']
+    assert results == [('aip', checksum.upper(), checksum)]
+
+
+def test_verify_chunks_mismatch():
+    """Test a checksum which does not match."""
+    results = []
+    chunks = verify_chunks(iter([b'abc', b'def']), 'aip', 'md5', 'wrong',
+                           callback=lambda *args: results.append(args))
+    assert list(chunks) == [b'abc', b'def']
+    assert results[0][2] == hashlib.md5(b'abcdef').hexdigest()
+    # the last chunk is not sent if the error is fatal
+    received = []
+    with pytest.raises(FixityError):
+        for chunk in verify_chunks(iter([b'abc', b'def']), 'aip', 'md5',
+                                   'wrong', fatal=True):
+            received.append(chunk)
+    assert received == [b'abc']
@@ -11,6 +11,7 @@
 from __future__ import absolute_import, print_function
 
 from flask import Flask
+from mock import patch
 
 from invenio_archivematica import InvenioArchivematica
 from invenio_archivematica.views.ui import blueprint
@@ -42,3 +43,23 @@ def test_view(app, oauth2):
         res = client.get("/oais/")
         assert res.status_code == 200
         assert 'Welcome to Invenio-Archivematica' in str(res.data)
+
+
+def test_factories(app):
+    """Test that the factories are imported once, and follow the config."""
+    from invenio_archivematica.factories import is_archivable_default, \
+        is_archivable_none, transfer_cp
+
+    ext = app.extensions['invenio-archivematica']
+    assert ext.transfer_factory is transfer_cp
+    assert ext.isarchivable_factory is is_archivable_default
+    with patch('invenio_archivematica.ext.import_string') as import_string:
+        assert ext.isarchivable_factory is is_archivable_default
+        assert not import_string.called
+    app.config['ARCHIVEMATICA_ISARCHIVABLE_FACTORY'] = \
+        'invenio_archivematica.factories.is_archivable_none'
+    assert ext.isarchivable_factory is is_archivable_none
+    app.config['ARCHIVEMATICA_ISARCHIVABLE_FACTORY'] = None
+    assert ext.isarchivable_factory is None
+    app.config['ARCHIVEMATICA_ISARCHIVABLE_FACTORY'] = is_archivable_none
+    assert ext.isarchivable_factory is is_archivable_none
@@ -9,9 +9,11 @@
 """Test the models."""
 
 import uuid
+from datetime import datetime
 
 from invenio_accounts.testutils import create_test_user
 from invenio_sipstore.api import SIP
+from invenio_sipstore.models import SIP as SIPModel
 
 from invenio_archivematica.models import Archive, ArchiveStatus, \
     status_converter
@@ -61,3 +63,78 @@ def test_Archive(db):
     assert ark.archivematica_id == sip.id
     # we try to get a non existing record
     assert Archive.get_from_sip(uuid.uuid4()) is None
+
+
+def test_Archive_iter_chunks(db):
+    """Test the Archive.iter_chunks method."""
+    for i in range(5):
+        Archive.create(SIPModel.create())
+    db.session.commit()
+    ids = [ark.id for ark in Archive.query.order_by(Archive.id)]
+
+    chunks = list(Archive.iter_chunks(Archive.query, 2))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert [ark.id for chunk in chunks for ark in chunk] == ids
+    # we can start after a given ID, and select only some columns
+    query = db.session.query(Archive.id, Archive.sip_id)
+    chunks = list(Archive.iter_chunks(query, 3, after_id=ids[1]))
+    assert [row.id for chunk in chunks for row in chunk] == ids[2:]
+    # nothing is yielded for an empty result
+    query = Archive.query.filter_by(status=ArchiveStatus.DELETED)
+    assert list(Archive.iter_chunks(query, 2)) == []
+
+
+def test_Archive_claim_new(db):
+    """Test the Archive.claim_new method."""
+    sips = [SIPModel.create() for i in range(3)]
+    for sip in sips:
+        Archive.create(sip)
+    db.session.commit()
+    before = datetime.utcnow()
+    # only the new archives are claimed
+    ark = Archive.get_from_sip(sips[0].id)
+    ark.status = ArchiveStatus.IGNORED
+    db.session.commit()
+
+    claimed = Archive.claim_new(before, 1)
+    db.session.commit()
+    assert claimed == [(Archive.get_from_sip(sips[1].id).id, sips[1].id)]
+    assert Archive.get_from_sip(sips[1].id).status == ArchiveStatus.QUEUED
+    claimed = Archive.claim_new(before, 5)
+    db.session.commit()
+    assert [sip_id for ark_id, sip_id in claimed] == [sips[2].id]
+    assert Archive.claim_new(before, 5) == []
+
+
+def test_Archive_set_status(db):
+    """Test the Archive.set_status method."""
+    sips = [SIPModel.create() for i in range(3)]
+    for sip in sips:
+        Archive.create(sip)
+    db.session.commit()
+    uuids = [str(sip.id) for sip in sips]
+    aipid = str(uuid.uuid4())
+
+    # the sips are changed by chunks, unknown sips are ignored
+    changed = Archive.set_status(uuids + [str(uuid.uuid4())],
+                                 ArchiveStatus.PROCESSING_AIP,
+                                 {uuids[0]: aipid}, chunk_size=2)
+    db.session.commit()
+    assert sorted(changed) == sorted(uuids)
+    arks = [Archive.get_from_sip(sip.id) for sip in sips]
+    assert all(ark.status == ArchiveStatus.PROCESSING_AIP for ark in arks)
+    assert str(arks[0].archivematica_id) == aipid
+    assert arks[1].archivematica_id is None
+    # only the archives differing from the change are changed
+    assert Archive.set_status(uuids, ArchiveStatus.PROCESSING_AIP,
+                              {uuids[0]: aipid}, only_changed=True) == []
+    assert Archive.set_status(uuids, ArchiveStatus.PROCESSING_AIP,
+                              {uuids[1]: aipid}, only_changed=True) == \
+        [uuids[1]]
+    db.session.commit()
+    assert str(Archive.get_from_sip(sips[1].id).archivematica_id) == aipid
+    # a None ID keeps the current one
+    assert sorted(Archive.set_status(uuids, ArchiveStatus.REGISTERED,
+                                     {uuids[0]: None})) == sorted(uuids)
+    db.session.commit()
+    assert str(Archive.get_from_sip(sips[0].id).archivematica_id) == aipid
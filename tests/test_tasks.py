@@ -10,12 +10,21 @@
 
 import time
 import uuid
+from datetime import datetime, timedelta
 
+import pytest
 from invenio_sipstore.models import SIP
+from mock import patch
+from requests import Response
+from requests.exceptions import ConnectionError, HTTPError
 
+from invenio_archivematica.client import ArchivematicaClient
 from invenio_archivematica.models import Archive, ArchiveStatus
-from invenio_archivematica.tasks import archive_new_sips, oais_fail_transfer, \
-    oais_finish_transfer, oais_process_aip, oais_process_transfer, \
+from invenio_archivematica.signals import oais_fixity_failed, \
+    oais_transfer_failed
+from invenio_archivematica.tasks import archive_new_sips, oais_audit_fixity, \
+    oais_change_status_bulk, oais_fail_transfer, oais_finish_transfer, \
+    oais_process_aip, oais_process_transfer, oais_reconcile_archives, \
     oais_start_transfer
 
 
@@ -137,3 +146,305 @@ def test_archive_new_sips(db, location):
             assert ark.status == ArchiveStatus.IGNORED
         else:
             assert ark.status == ArchiveStatus.WAITING
+
+
+def test_archive_new_sips_chunks(db, location):
+    """Test the archive_new_sips function with several chunks."""
+    sips = [SIP.create() for i in range(5)]
+    for sip in sips:
+        Archive.create(sip)
+    db.session.commit()
+    archive_new_sips('invenio_archivematica.factories.create_accession_id',
+                     days=0, delay=False, chunk_size=2)
+    assert Archive.query.filter_by(status=ArchiveStatus.WAITING).count() == 5
+    for sip in sips:
+        ark = Archive.get_from_sip(sip.id)
+        assert ark.accession_id.endswith(str(sip.id))
+
+
+def test_archive_new_sips_max_sips(db, location):
+    """Test the archive_new_sips function with a limit of sips per run."""
+    for i in range(5):
+        Archive.create(SIP.create())
+    db.session.commit()
+    facto = 'invenio_archivematica.factories.create_accession_id'
+    ret = archive_new_sips(facto, days=0, delay=False, chunk_size=2,
+                           max_sips=3)
+    assert ret == {'enqueued': 3, 'deferred': 2}
+    assert Archive.query.filter_by(status=ArchiveStatus.WAITING).count() == 3
+    # the next run archives the remaining sips
+    ret = archive_new_sips(facto, days=0, delay=False, max_sips=3)
+    assert ret == {'enqueued': 2, 'deferred': 0}
+    assert Archive.query.filter_by(status=ArchiveStatus.NEW).count() == 0
+
+
+def test_archive_new_sips_batches(db):
+    """Test that the delayed transfers are sent to Celery by batches."""
+    sips = [SIP.create() for i in range(5)]
+    for sip in sips:
+        Archive.create(sip)
+    db.session.commit()
+    with patch.object(oais_start_transfer, 'chunks') as chunks:
+        ret = archive_new_sips(
+            'invenio_archivematica.factories.create_accession_id',
+            days=0, batch_size=2)
+    assert ret == {'enqueued': 5, 'deferred': 0}
+    chunks.assert_called_once()
+    transfers, batch_size = chunks.call_args[0]
+    assert batch_size == 2
+    assert [t[0] for t in transfers] == [str(sip.id) for sip in sips]
+    assert chunks.return_value.apply_async.called
+    # the archives are claimed, another run doesn't send them again
+    assert Archive.query.filter_by(status=ArchiveStatus.QUEUED).count() == 5
+    with patch.object(oais_start_transfer, 'chunks') as chunks:
+        ret = archive_new_sips(
+            'invenio_archivematica.factories.create_accession_id', days=0)
+    assert ret == {'enqueued': 0, 'deferred': 0}
+    assert not chunks.called
+
+
+def test_archive_new_sips_dispatch_error(db):
+    """Test that the archives are released if they can't be sent."""
+    for i in range(3):
+        Archive.create(SIP.create())
+    db.session.commit()
+    with patch.object(oais_start_transfer, 'chunks',
+                      side_effect=IOError('broker down')):
+        with pytest.raises(IOError):
+            archive_new_sips(
+                'invenio_archivematica.factories.create_accession_id',
+                days=0)
+    assert Archive.query.filter_by(status=ArchiveStatus.NEW).count() == 3
+
+
+def test_archive_new_sips_release_queued(app, db):
+    """Test that the archives queued for too long are claimed again."""
+    sips = [SIP.create() for i in range(2)]
+    for sip in sips:
+        ark = Archive.create(sip)
+        ark.status = ArchiveStatus.QUEUED
+    db.session.commit()
+    # the ORM would update the date of the archive
+    Archive.query.filter_by(sip_id=sips[0].id).update(
+        {'updated': datetime.utcnow() - timedelta(days=2)})
+    db.session.commit()
+    app.config['ARCHIVEMATICA_QUEUED_TIMEOUT'] = 24 * 60 * 60
+    with patch.object(oais_start_transfer, 'chunks') as chunks:
+        ret = archive_new_sips(
+            'invenio_archivematica.factories.create_accession_id', days=0)
+    assert ret == {'enqueued': 1, 'deferred': 0}
+    transfers, batch_size = chunks.call_args[0]
+    assert [t[0] for t in transfers] == [str(sips[0].id)]
+    assert Archive.query.filter_by(status=ArchiveStatus.QUEUED).count() == 2
+
+
+def test_oais_change_status_bulk(db):
+    """Test the oais_change_status_bulk function."""
+    sips = [SIP.create() for i in range(2)]
+    for sip in sips:
+        Archive.create(sip)
+    db.session.commit()
+    aipid = uuid.uuid4()
+    oais_change_status_bulk([str(sip.id) for sip in sips],
+                            'PROCESSING_AIP', {str(sips[1].id): str(aipid)})
+    arks = [Archive.get_from_sip(sip.id) for sip in sips]
+    assert all(ark.status == ArchiveStatus.PROCESSING_AIP for ark in arks)
+    assert arks[0].archivematica_id is None
+    assert arks[1].archivematica_id == aipid
+    # not every status can be changed in bulk
+    with pytest.raises(ValueError):
+        oais_change_status_bulk([str(sips[0].id)], ArchiveStatus.WAITING)
+
+
+def test_oais_tasks_signals(db):
+    """Test that the signals are sent with the sip, if they are listened."""
+    sip = SIP.create()
+    Archive.create(sip)
+    db.session.commit()
+    received = []
+
+    def receiver(sender, *args, **kwargs):
+        received.append(sender)
+
+    with patch('invenio_archivematica.tasks.SIPModel') as model:
+        oais_process_transfer(sip.id)
+    # nobody listens, we don't load the sip
+    assert not model.query.filter.called
+    oais_transfer_failed.connect(receiver)
+    try:
+        oais_fail_transfer(sip.id)
+    finally:
+        oais_transfer_failed.disconnect(receiver)
+    assert len(received) == 1
+    assert received[0].id == sip.id
+    assert received[0].archived is False
+
+
+def test_oais_reconcile_archives(db):
+    """Test the oais_reconcile_archives function."""
+    statuses = [ArchiveStatus.WAITING, ArchiveStatus.PROCESSING_TRANSFER,
+                ArchiveStatus.PROCESSING_AIP, ArchiveStatus.NEW]
+    sips = [SIP.create() for status in statuses]
+    aipids = [str(uuid.uuid4()) for status in statuses]
+    for sip, status, aipid in zip(sips, statuses, aipids):
+        ark = Archive.create(sip, archivematica_id=aipid)
+        ark.status = status
+    db.session.commit()
+    new_aipid = str(uuid.uuid4())
+    remote = {
+        aipids[0]: (ArchiveStatus.PROCESSING_TRANSFER, aipids[0]),
+        aipids[1]: (ArchiveStatus.REGISTERED, new_aipid),
+    }
+
+    def get_real_status(status, archivematica_id):
+        if str(archivematica_id) not in remote:
+            raise HTTPError('not found')
+        return remote[str(archivematica_id)]
+
+    with patch.object(ArchivematicaClient, 'get_real_status',
+                      side_effect=get_real_status) as mock:
+        ret = oais_reconcile_archives(chunk_size=2, max_workers=2)
+    # new archives are not sent to Archivematica
+    assert mock.call_count == 3
+    assert ret == {'PROCESSING_TRANSFER': 1, 'REGISTERED': 1}
+    ark = Archive.get_from_sip(sips[0].id)
+    assert ark.status == ArchiveStatus.PROCESSING_TRANSFER
+    ark = Archive.get_from_sip(sips[1].id)
+    assert ark.status == ArchiveStatus.REGISTERED
+    assert str(ark.archivematica_id) == new_aipid
+    assert ark.sip.archived is True
+    assert ark.check_attempts == 0
+    # the error is ignored, the archive will be checked later
+    ark = Archive.get_from_sip(sips[2].id)
+    assert ark.status == ArchiveStatus.PROCESSING_AIP
+    assert ark.check_attempts == 1
+    assert ark.next_check_at > datetime.utcnow() + timedelta(seconds=100)
+    # the archives are not checked again before their next check
+    with patch.object(ArchivematicaClient, 'get_real_status') as mock:
+        assert oais_reconcile_archives() == {}
+    assert not mock.called
+
+
+def test_oais_reconcile_archives_backoff(app, db):
+    """Test that unchanged archives are checked less and less often."""
+    app.config.update(ARCHIVEMATICA_POLL_BASE_DELAY=10,
+                      ARCHIVEMATICA_POLL_MAX_DELAY=30)
+    sip = SIP.create()
+    aipid = str(uuid.uuid4())
+    ark = Archive.create(sip, archivematica_id=aipid)
+    ark.status = ArchiveStatus.PROCESSING_AIP
+    db.session.commit()
+    delays = []
+    for i in range(3):
+        with patch.object(ArchivematicaClient, 'get_real_status',
+                          return_value=(ArchiveStatus.PROCESSING_AIP, aipid)):
+            oais_reconcile_archives()
+        ark = Archive.get_from_sip(sip.id)
+        delays.append((ark.next_check_at - datetime.utcnow()).seconds)
+        # we pretend it is time to check again
+        ark.next_check_at = datetime.utcnow()
+        db.session.commit()
+    assert ark.check_attempts == 3
+    assert [delay // 10 for delay in delays] == [1, 2, 2]
+
+
+def test_oais_reconcile_archives_concurrent_change(db):
+    """Test that a change done during the requests is not overwritten."""
+    sip = SIP.create()
+    aipid = str(uuid.uuid4())
+    ark = Archive.create(sip, archivematica_id=aipid)
+    ark.status = ArchiveStatus.PROCESSING_TRANSFER
+    db.session.commit()
+    engine = db.engine
+
+    def get_real_status(status, archivematica_id):
+        # e.g. a callback of Archivematica is processed meanwhile
+        engine.execute(Archive.__table__.update().values(
+            status=ArchiveStatus.REGISTERED))
+        return ArchiveStatus.PROCESSING_AIP, aipid
+
+    with patch.object(ArchivematicaClient, 'get_real_status',
+                      side_effect=get_real_status):
+        assert oais_reconcile_archives() == {}
+    assert Archive.get_from_sip(sip.id).status == ArchiveStatus.REGISTERED
+
+
+def test_oais_audit_fixity(app, db):
+    """Test the periodic fixity checks of the registered archives."""
+    sips = [SIP.create() for i in range(4)]
+    aipids = [str(uuid.uuid4()) for sip in sips]
+    for sip, aipid in zip(sips, aipids):
+        ark = Archive.create(sip)
+        ark.archivematica_id = aipid
+        ark.status = ArchiveStatus.REGISTERED
+    # not registered yet
+    Archive.get_from_sip(sips[3].id).status = ArchiveStatus.PROCESSING_AIP
+    db.session.commit()
+    reports = {
+        aipids[0]: {'success': True},
+        aipids[1]: {'success': False, 'message': 'Bag is invalid'},
+    }
+
+    def check_fixity(uuid, timeout=None):
+        if str(uuid) not in reports:
+            raise HTTPError('not found')
+        return reports[str(uuid)]
+
+    failed = []
+    with oais_fixity_failed.connected_to(
+            lambda sip, report: failed.append(sip.id)):
+        with patch.object(ArchivematicaClient, 'check_fixity',
+                          side_effect=check_fixity) as mock:
+            # the run is limited, the next one continues
+            assert oais_audit_fixity(chunk_size=1, max_archives=2) == \
+                {'ok': 1, 'failed': 1}
+            assert oais_audit_fixity() == {'error': 1}
+            assert mock.call_count == 3
+            ark = Archive.get_from_sip(sips[2].id)
+            assert ark.fixity_checked_at is not None
+            assert ark.fixity_ok is None
+            # the archive without a verdict is checked again later
+            assert oais_audit_fixity() == {}
+            app.config['ARCHIVEMATICA_FIXITY_RETRY_DELAY'] = 0
+            assert oais_audit_fixity() == {'error': 1}
+            reports[aipids[2]] = {'success': True}
+            assert oais_audit_fixity() == {'ok': 1}
+            assert oais_audit_fixity() == {}
+    assert failed == [sips[1].id]
+    assert Archive.get_from_sip(sips[0].id).fixity_ok is True
+    assert Archive.get_from_sip(sips[1].id).fixity_ok is False
+    assert Archive.get_from_sip(sips[2].id).fixity_ok is True
+    assert Archive.get_from_sip(sips[3].id).fixity_checked_at is None
+
+
+def test_oais_audit_fixity_errors(db):
+    """Test that the checks without a verdict do not stall the sweep."""
+    sips = [SIP.create() for i in range(3)]
+    aipids = [str(uuid.uuid4()) for sip in sips]
+    for sip, aipid in zip(sips, aipids):
+        ark = Archive.create(sip)
+        ark.archivematica_id = aipid
+        ark.status = ArchiveStatus.REGISTERED
+    db.session.commit()
+    not_found = Response()
+    not_found.status_code = 404
+
+    def check_fixity(uuid, timeout=None):
+        if str(uuid) == aipids[0]:
+            raise ConnectionError('connection refused')
+        if str(uuid) == aipids[1]:
+            raise HTTPError('not found', response=not_found)
+        return {'success': True}
+
+    failed = []
+    with oais_fixity_failed.connected_to(
+            lambda sip, report: failed.append(sip.id)):
+        with patch.object(ArchivematicaClient, 'check_fixity',
+                          side_effect=check_fixity):
+            # the error is not counted, a missing AIP fails its check
+            assert oais_audit_fixity(chunk_size=1, max_archives=1) == \
+                {'error': 1, 'failed': 1}
+            assert oais_audit_fixity(chunk_size=1, max_archives=1) == \
+                {'ok': 1}
+    assert failed == [sips[1].id]
+    assert Archive.get_from_sip(sips[1].id).fixity_ok is False
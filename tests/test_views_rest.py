@@ -8,18 +8,34 @@
 
 """Test the REST API."""
 
+import hashlib
 import json
 import uuid
+from io import BytesIO
 
 from flask import url_for
 from invenio_sipstore.models import SIP
 from mock import patch
 from requests import Response
+from requests.exceptions import ConnectionError
 
+from invenio_archivematica.aipcache import AIPCache
 from invenio_archivematica.models import Archive, ArchiveStatus
+from invenio_archivematica.signals import oais_download_verified
+from invenio_archivematica.tasks import oais_change_status_bulk, \
+    oais_notify_status
 from invenio_archivematica.views.rest import validate_status
 
 
+def storage_response(status_code, content=b'', headers=None):
+    """Return a streamed response of Archivematica Storage."""
+    response = Response()
+    response.status_code = status_code
+    response.raw = BytesIO(content)
+    response.headers.update(headers or {})
+    return response
+
+
 def test_validate_status():
     """Test the function validate_status."""
     assert validate_status('SIP_PROCESSING') is True
@@ -63,6 +79,25 @@ def test_Archive_get_200(db, client, oauth2):
         and result['archivematica_id'] == str(ark.archivematica_id)
 
 
+def test_Archive_get_realstatus_520(db, client, oauth2):
+    """Test the Archive's get method with Archivematica unreachable."""
+    sip = SIP.create()
+    ark = Archive.create(sip=sip, accession_id='id',
+                         archivematica_id=uuid.uuid4())
+    ark.status = ArchiveStatus.WAITING
+    db.session.commit()
+
+    with patch('requests.Session.get',
+               side_effect=ConnectionError('connection refused')):
+        response = client.get(url_for(
+            'invenio_archivematica_api.archive_api',
+            accession_id=ark.accession_id,
+            access_token=oauth2.token),
+                              data=json.dumps({'realStatus': True}),
+                              content_type='application/json')
+    assert response.status_code == 520
+
+
 def test_Archive_get_realstatus_transfer(db, client, oauth2):
     """Test the Archive's get method with transfer processing."""
     sip = SIP.create()
@@ -76,7 +111,7 @@ def test_Archive_get_realstatus_transfer(db, client, oauth2):
     mock_response._content = json.dumps({
         'status': 'SIP_PROCESSING'
     }).encode('utf-8')
-    with patch('requests.get', return_value=mock_response):
+    with patch('requests.Session.get', return_value=mock_response):
         response = client.get(url_for(
             'invenio_archivematica_api.archive_api',
             accession_id=ark.accession_id,
@@ -105,7 +140,7 @@ def test_Archive_get_realstatus_ingest(db, client, oauth2):
     mock_response.status_code = 200
     mock_response._content = json.dumps({'status': 'COMPLETE',
                                          'sip_uuid': new_uuid}).encode('utf-8')
-    with patch('requests.get', return_value=mock_response):
+    with patch('requests.Session.get', return_value=mock_response):
         response = client.get(url_for(
             'invenio_archivematica_api.archive_api',
             accession_id=ark.accession_id,
@@ -130,7 +165,7 @@ def test_Archive_get_status_code(db, client, oauth2):
     db.session.commit()
     mock_response = Response()
     mock_response.status_code = 404
-    with patch('requests.get', return_value=mock_response):
+    with patch('requests.Session.get', return_value=mock_response):
         response = client.get(url_for(
             'invenio_archivematica_api.archive_api',
             accession_id=ark.accession_id,
@@ -140,6 +175,151 @@ def test_Archive_get_status_code(db, client, oauth2):
     assert response.status_code == mock_response.status_code
 
 
+def test_ArchiveList_get_401(client):
+    """Test the listing with no API key."""
+    response = client.get(url_for(
+        'invenio_archivematica_api.archive_list_api'))
+    assert response.status_code == 401
+
+
+def test_ArchiveList_get_200(db, client, oauth2):
+    """Test the listing with filters and pages."""
+    sips = [SIP.create() for i in range(5)]
+    for sip in sips:
+        Archive.create(sip)
+    db.session.commit()
+    for sip in sips[:3]:
+        Archive.get_from_sip(sip.id).status = ArchiveStatus.REGISTERED
+    db.session.commit()
+
+    def get(**kwargs):
+        response = client.get(url_for(
+            'invenio_archivematica_api.archive_list_api',
+            access_token=oauth2.token, **kwargs))
+        assert response.status_code == 200
+        return json.loads(response.data.decode('utf-8'))
+
+    result = get(size=2)
+    assert [hit['sip_id'] for hit in result['hits']] == \
+        [str(sip.id) for sip in sips[:2]]
+    assert 'next' in result['links']
+    # we follow the links until the last page
+    hits = result['hits']
+    while 'next' in result['links']:
+        assert 'access_token' not in result['links']['next']
+        response = client.get(result['links']['next'], headers={
+            'Authorization': 'Bearer {}'.format(oauth2.token)})
+        result = json.loads(response.data.decode('utf-8'))
+        hits.extend(result['hits'])
+    assert [hit['sip_id'] for hit in hits] == [str(sip.id) for sip in sips]
+
+    result = get(status='REGISTERED', size=10)
+    assert len(result['hits']) == 3
+    assert result['links'] == {}
+    assert all(hit['status'] == 'REGISTERED' for hit in result['hits'])
+    result = get(status=['NEW', 'FAILED'])
+    assert len(result['hits']) == 2
+    result = get(sip_id=str(sips[4].id))
+    assert [hit['sip_id'] for hit in result['hits']] == [str(sips[4].id)]
+    result = get(created_before='2000-01-01T00:00:00')
+    assert result['hits'] == []
+
+
+def test_ArchiveList_get_422(client, oauth2):
+    """Test the listing with invalid filters."""
+    for params in ({'status': 'unknown'}, {'size': 0}):
+        response = client.get(url_for(
+            'invenio_archivematica_api.archive_list_api',
+            access_token=oauth2.token, **params))
+        assert response.status_code == 422
+
+
+def test_ArchivesStatus_post_401(client):
+    """Test the batch status with no API key."""
+    response = client.post(url_for(
+        'invenio_archivematica_api.archives_status_api'),
+        data=json.dumps({'accession_ids': ['test']}),
+        content_type='application/json')
+    assert response.status_code == 401
+
+
+def test_ArchivesStatus_post_400(client, oauth2):
+    """Test the batch status with both or none of the identifiers."""
+    url = url_for('invenio_archivematica_api.archives_status_api',
+                  access_token=oauth2.token)
+    for params in ({}, {'accession_ids': ['a'], 'sip_ids': []}):
+        response = client.post(url, data=json.dumps(params),
+                               content_type='application/json')
+        assert response.status_code == 400
+
+
+def test_ArchivesStatus_post_200(db, client, oauth2):
+    """Test the batch status by accession ID and by sip ID."""
+    sips = [SIP.create() for i in range(2)]
+    arks = [Archive.create(sip, accession_id='id{}'.format(i))
+            for i, sip in enumerate(sips)]
+    arks[1].status = ArchiveStatus.WAITING
+    db.session.commit()
+    url = url_for('invenio_archivematica_api.archives_status_api',
+                  access_token=oauth2.token)
+
+    response = client.post(url, data=json.dumps(
+        {'accession_ids': ['id0', 'id1', 'unknown']}),
+        content_type='application/json')
+    assert response.status_code == 200
+    result = json.loads(response.data.decode('utf-8'))
+    assert result['archives']['id0']['status'] == 'NEW'
+    assert result['archives']['id1']['status'] == 'WAITING'
+    assert result['archives']['id1']['sip_id'] == str(sips[1].id)
+    assert result['errors'] == {'unknown': 404}
+
+    response = client.post(url, data=json.dumps(
+        {'sip_ids': [str(sips[0].id)]}),
+        content_type='application/json')
+    result = json.loads(response.data.decode('utf-8'))
+    assert list(result['archives']) == [str(sips[0].id)]
+    assert result['archives'][str(sips[0].id)]['accession_id'] == 'id0'
+
+
+def test_ArchivesStatus_post_realstatus(db, client, oauth2):
+    """Test the batch status asking Archivematica."""
+    sips = [SIP.create() for i in range(3)]
+    aipids = [uuid.uuid4() for sip in sips]
+    for i, (sip, aipid) in enumerate(zip(sips, aipids)):
+        ark = Archive.create(sip, accession_id='id{}'.format(i),
+                             archivematica_id=aipid)
+        ark.status = ArchiveStatus.PROCESSING_AIP
+    db.session.commit()
+    remote = {
+        str(aipids[0]): ('PROCESSING', 200),
+        str(aipids[1]): ('COMPLETE', 200),
+        str(aipids[2]): (None, 500),
+    }
+
+    def get(url, **kwargs):
+        status, code = remote[url.split('/')[-2]]
+        response = Response()
+        response.status_code = code
+        response._content = json.dumps({'status': status}).encode('utf-8')
+        return response
+
+    with patch('requests.Session.get', side_effect=get):
+        response = client.post(url_for(
+            'invenio_archivematica_api.archives_status_api',
+            access_token=oauth2.token),
+            data=json.dumps({'accession_ids': ['id0', 'id1', 'id2'],
+                             'realStatus': True}),
+            content_type='application/json')
+    assert response.status_code == 200
+    result = json.loads(response.data.decode('utf-8'))
+    assert result['archives']['id0']['status'] == 'PROCESSING_AIP'
+    assert result['archives']['id1']['status'] == 'REGISTERED'
+    assert result['archives']['id2']['status'] == 'PROCESSING_AIP'
+    assert result['errors'] == {'id2': 500}
+    assert Archive.get_from_sip(sips[1].id).status == \
+        ArchiveStatus.REGISTERED
+
+
 def test_Archive_patch_401(client):
     """Test the Archive's get method with no API key."""
     response = client.patch(url_for(
@@ -158,13 +338,18 @@ def test_Archive_patch_200(db, client, oauth2):
         'archivematica_id': str(uuid.uuid4()),
         'status': 'COMPLETE'
     }
-    response = client.patch(url_for(
-        'invenio_archivematica_api.archive_api',
-        accession_id=ark.accession_id,
-        access_token=oauth2.token),
-                            data=json.dumps(params),
-                            content_type='application/json')
-    assert response.status_code == 200
+    url = url_for('invenio_archivematica_api.archive_api',
+                  accession_id=ark.accession_id,
+                  access_token=oauth2.token)
+    with patch.object(oais_notify_status, 'delay') as notify:
+        response = client.patch(url, data=json.dumps(params),
+                                content_type='application/json')
+        # the change is accepted, and done once
+        assert response.status_code == 202
+        assert client.patch(url, data=json.dumps(params),
+                            content_type='application/json'
+                            ).status_code == 200
+    assert notify.call_count == 1
     result = json.loads(response.data.decode('utf-8'))
     assert 'sip_id' in result and result['sip_id'] == str(sip.id)
     assert 'status' in result and result['status'] == 'REGISTERED'
@@ -177,6 +362,83 @@ def test_Archive_patch_200(db, client, oauth2):
     assert str(ark.archivematica_id) == params['archivematica_id']
 
 
+def test_ArchivematicaCallback_post_auth(app, client):
+    """Test the authentication of the notifications of Archivematica."""
+    url = url_for('invenio_archivematica_api.callback_api')
+    data = json.dumps({'event': 'post_store'})
+    # disabled
+    response = client.post(url, data=data, content_type='application/json')
+    assert response.status_code == 404
+    app.config['ARCHIVEMATICA_CALLBACK_SECRET'] = 'secret'
+    response = client.post(url, data=data, content_type='application/json',
+                           headers={'X-Archivematica-Secret': 'wrong'})
+    assert response.status_code == 403
+    # the secret is not accepted in the URL
+    response = client.post(url + '?secret=secret', data=data,
+                           content_type='application/json')
+    assert response.status_code == 403
+    response = client.post(url, data=data, content_type='application/json',
+                           headers={'X-Archivematica-Secret': 'secret'})
+    assert response.status_code == 400
+
+
+def test_ArchivematicaCallback_post(app, db, client):
+    """Test the notifications of Archivematica."""
+    app.config['ARCHIVEMATICA_CALLBACK_SECRET'] = 'secret'
+    sip = SIP.create()
+    transfer_id = str(uuid.uuid4())
+    ark = Archive.create(sip)
+    ark.accession_id = 'id'
+    ark.archivematica_id = transfer_id
+    ark.status = ArchiveStatus.PROCESSING_TRANSFER
+    db.session.commit()
+
+    def post(**payload):
+        return client.post(
+            url_for('invenio_archivematica_api.callback_api'),
+            data=json.dumps(payload), content_type='application/json',
+            headers={'X-Archivematica-Secret': 'secret'})
+
+    aip_id = str(uuid.uuid4())
+    with patch.object(oais_change_status_bulk, 'delay') as delay:
+        response = post(event='transfer_completed', transfer_uuid=transfer_id,
+                        sip_uuid=aip_id)
+        assert response.status_code == 202
+        result = json.loads(response.data.decode('utf-8'))
+        assert result['status'] == 'PROCESSING_AIP'
+        assert result['archivematica_id'] == aip_id
+        delay.assert_called_once_with([str(sip.id)], 'PROCESSING_AIP',
+                                      {str(sip.id): aip_id},
+                                      only_changed=True)
+        assert post(event='post_store',
+                    package_uuid=str(uuid.uuid4())).status_code == 404
+        assert post(event='post_store',
+                    package_uuid='invalid').status_code == 400
+        # no identifier at all
+        assert post(event='post_store').status_code == 400
+        # the archive is found by its accession ID
+        assert post(event='transfer_failed', transfer_uuid=str(uuid.uuid4()),
+                    accession_id='id').status_code == 202
+        assert delay.call_count == 2
+        assert post(event='transfer_failed', transfer_uuid=transfer_id,
+                    accession_id='id').status_code == 202
+        # nothing to do if the archive has already the status
+        ark = Archive.get_from_sip(sip.id)
+        ark.status = ArchiveStatus.FAILED
+        db.session.commit()
+        assert post(event='transfer_failed',
+                    transfer_uuid=transfer_id).status_code == 200
+        assert delay.call_count == 3
+        # a late notification does not move the archive backwards
+        ark = Archive.get_from_sip(sip.id)
+        ark.status = ArchiveStatus.REGISTERED
+        ark.archivematica_id = aip_id
+        db.session.commit()
+        assert post(event='transfer_completed', transfer_uuid=transfer_id,
+                    sip_uuid=aip_id, accession_id='id').status_code == 409
+        assert delay.call_count == 3
+
+
 def test_ArchiveDownload_get_401(client):
     """Test the Download's get method with no API key."""
     response = client.get(url_for(
@@ -219,11 +481,143 @@ def test_ArchiveDownload_get_status_code(db, client, oauth2):
                          archivematica_id=uuid.uuid4())
     ark.status = ArchiveStatus.REGISTERED
     db.session.commit()
-    mock_response = Response()
-    mock_response.status_code = 404
-    with patch('requests.get', return_value=mock_response):
+    mock_response = storage_response(404)
+    with patch('requests.Session.get', return_value=mock_response):
         response = client.get(url_for(
             'invenio_archivematica_api.download_api',
             accession_id=ark.accession_id,
             access_token=oauth2.token))
     assert response.status_code == mock_response.status_code
+
+
+def test_ArchiveDownload_get_range(db, client, oauth2):
+    """Test that the download forwards the Range header."""
+    sip = SIP.create()
+    ark = Archive.create(sip=sip, accession_id='id',
+                         archivematica_id=uuid.uuid4())
+    ark.status = ArchiveStatus.REGISTERED
+    db.session.commit()
+    mock_response = storage_response(206, b'content', {
+        'Content-Range': 'bytes 10-16/100',
+        'Connection': 'keep-alive',
+    })
+    with patch('requests.Session.get', return_value=mock_response) as mock:
+        response = client.get(url_for(
+            'invenio_archivematica_api.download_api',
+            accession_id=ark.accession_id,
+            access_token=oauth2.token),
+            headers={'Range': 'bytes=10-16', 'If-Range': '"etag"'})
+    assert mock.call_args[1]['headers'] == {'Range': 'bytes=10-16',
+                                            'If-Range': '"etag"'}
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == 'bytes 10-16/100'
+    assert 'Connection' not in response.headers
+    assert response.data == b'content'
+
+
+def test_ArchiveDownload_get_416(db, client, oauth2):
+    """Test the download of a range that does not exist."""
+    sip = SIP.create()
+    ark = Archive.create(sip=sip, accession_id='id',
+                         archivematica_id=uuid.uuid4())
+    ark.status = ArchiveStatus.REGISTERED
+    db.session.commit()
+    mock_response = storage_response(416, headers={
+        'Content-Range': 'bytes */100'})
+    with patch('requests.Session.get', return_value=mock_response):
+        response = client.get(url_for(
+            'invenio_archivematica_api.download_api',
+            accession_id=ark.accession_id,
+            access_token=oauth2.token),
+            headers={'Range': 'bytes=200-'})
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == 'bytes */100'
+
+
+def test_ArchiveDownload_get_cache(app, db, client, oauth2, tmpdir):
+    """Test that the downloaded AIPs are served from the local cache."""
+    ext = app.extensions['invenio-archivematica']
+    ext.aip_cache = AIPCache(str(tmpdir), 100)
+    sip = SIP.create()
+    ark = Archive.create(sip=sip, accession_id='id',
+                         archivematica_id=uuid.uuid4())
+    ark.status = ArchiveStatus.REGISTERED
+    db.session.commit()
+    url = url_for('invenio_archivematica_api.download_api',
+                  accession_id=ark.accession_id, access_token=oauth2.token)
+    mock_response = storage_response(200, b'content',
+                                     {'Content-Length': '7'})
+    try:
+        with patch('requests.Session.get',
+                   return_value=mock_response) as mock:
+            assert client.get(url).data == b'content'
+            response = client.get(url)
+            assert response.status_code == 200
+            assert response.data == b'content'
+        assert mock.call_count == 1
+    finally:
+        ext.aip_cache = None
+
+
+def test_ArchiveDownload_get_offload(app, db, client, oauth2, tmpdir):
+    """Test that the download is offloaded to the front-end server."""
+    sip = SIP.create()
+    aipid = uuid.uuid4()
+    ark = Archive.create(sip=sip, accession_id='id', archivematica_id=aipid)
+    ark.status = ArchiveStatus.REGISTERED
+    db.session.commit()
+    url = url_for('invenio_archivematica_api.download_api',
+                  accession_id=ark.accession_id, access_token=oauth2.token)
+
+    app.config['ARCHIVEMATICA_DOWNLOAD_OFFLOAD'] = 'x-accel-redirect'
+    with patch('requests.Session.get') as mock:
+        response = client.get(url)
+    assert not mock.called
+    assert response.status_code == 200
+    assert response.headers['X-Accel-Redirect'].startswith(
+        '/_archivematica_storage/api/v2/file/{}/download/?'.format(aipid))
+
+    app.config['ARCHIVEMATICA_DOWNLOAD_OFFLOAD'] = 'x-sendfile'
+    aip = tmpdir.join('aip.7z')
+    aip.write(b'content')
+    mock_response = Response()
+    mock_response.status_code = 200
+    mock_response._content = json.dumps(
+        {'current_full_path': str(aip)}).encode('utf-8')
+    with patch('requests.Session.get', return_value=mock_response) as mock:
+        response = client.get(url)
+    assert '/api/v2/file/{}/'.format(aipid) in mock.call_args[0][0]
+    assert response.headers['X-Sendfile'] == str(aip)
+
+
+def test_ArchiveDownload_get_fixity(app, db, client, oauth2):
+    """Test that the checksum of the AIP is verified while downloading."""
+    app.config['ARCHIVEMATICA_DOWNLOAD_FIXITY'] = True
+    sip = SIP.create()
+    aipid = uuid.uuid4()
+    ark = Archive.create(sip=sip, accession_id='id', archivematica_id=aipid)
+    ark.status = ArchiveStatus.REGISTERED
+    db.session.commit()
+    pointer = storage_response(200, (
+        '<mets:mets xmlns:mets="http://www.loc.gov/METS/"'
+        ' xmlns:premis="info:lc/xmlns/premis-v2">'
+        '<premis:fixity>'
+        '<premis:messageDigestAlgorithm>md5</premis:messageDigestAlgorithm>'
+        '<premis:messageDigest>{}</premis:messageDigest>'
+        '</premis:fixity></mets:mets>'
+    ).format(hashlib.md5(b'content').hexdigest()).encode('utf-8'))
+    pointer._content = pointer.raw.read()
+    content = storage_response(200, b'content')
+    results = []
+
+    def listener(sender, **kwargs):
+        results.append((sender, kwargs['expected'] == kwargs['computed']))
+
+    with oais_download_verified.connected_to(listener):
+        with patch('requests.Session.get',
+                   side_effect=[content, pointer]):
+            response = client.get(url_for(
+                'invenio_archivematica_api.download_api',
+                accession_id=ark.accession_id, access_token=oauth2.token))
+            assert response.data == b'content'
+    assert results == [(str(aipid), True)]